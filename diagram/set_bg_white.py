@@ -1,14 +1,63 @@
 #!/usr/bin/env python3
+# Give wavedrom SVGs a white background so they read on dark themes.
+#
+# Files are streamed through in chunks into a temporary file, with every
+# background marker replaced. It replaces the original only if a background
+# was missing.
+import os
 import sys
 
-if len(sys.argv) < 2:
-    sys.exit(1)
+MARKER = b"</defs><g"
+REPLACEMENT = b'</defs><rect width="100%" height="100%" fill="white"/><g'
+CHUNK_BYTES = 1 << 16
 
-with open(sys.argv[1], 'rb') as fp:
-    data = fp.read()
-    data_new = data.replace(b"</defs><g", b'</defs><rect width="100%" height="100%" fill="white"/><g')
+def set_bg_white(path):
+    tmp = path + ".tmp"
+    changed = False
 
-if data != data_new:
-    print("Writing new SVG")
-    with open(sys.argv[1], 'wb') as fp:
-        fp.write(data_new)
+    with open(path, "rb") as src, open(tmp, "wb") as dst:
+        tail = b""
+        while True:
+            chunk = src.read(CHUNK_BYTES)
+            data = tail + chunk
+
+            if not chunk:
+                split = len(data)
+            else:
+                # hold back enough to catch a marker split across chunks, or
+                # all of one that straddles the split
+                split = max(len(data) - len(MARKER) + 1, 0)
+                straddling = data.find(MARKER, max(split - len(MARKER) + 1, 0))
+                if straddling != -1 and straddling < split:
+                    split = straddling + len(MARKER)
+
+            head = data[:split]
+            if MARKER in head:
+                head = head.replace(MARKER, REPLACEMENT)
+                changed = True
+
+            dst.write(head)
+            tail = data[split:]
+
+            if not chunk:
+                break
+
+    if changed:
+        os.replace(tmp, path)
+    else:
+        os.unlink(tmp)
+
+    return changed
+
+def main():
+    if len(sys.argv) < 2:
+        return 1
+
+    for path in sys.argv[1:]:
+        if set_bg_white(path):
+            print("Writing new SVG %s" % path)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -114,23 +114,34 @@ uint64_t reflect(uint64_t v, unsigned int bitwidth) {
   uint64_t nv = 0;
 
   for (size_t i = 0; i < bitwidth; i++) {
-    if (v & (1 << i))
-      nv |= 1 << (bitwidth - i - 1);
+    if (v & (1ULL << i))
+      nv |= 1ULL << (bitwidth - i - 1);
   }
 
   return nv;
 }
 
+// (1 << 64) - 1 is undefined, spell out the full width mask
+static uint64_t crc_bitmask(unsigned int bitwidth) {
+  return bitwidth >= 64 ? ~0ULL : (1ULL << bitwidth) - 1;
+}
+
+uint64_t crc_generic_unrolled(struct crc_info *param, const uint8_t *buf, size_t size);
+
 uint64_t crc_generic(struct crc_info *param, const uint8_t *buf, size_t size) {
-  uint64_t bitmask = (1UL << param->bitwidth) - 1;
-  uint64_t topbitmask = 1UL << (param->bitwidth-1);
+  // the byte is xored in below the top bit, which needs at least 8 bits
+  if (param->bitwidth < 8)
+    return crc_generic_unrolled(param, buf, size);
+
+  uint64_t bitmask = crc_bitmask(param->bitwidth);
+  uint64_t topbitmask = 1ULL << (param->bitwidth-1);
 
   uint64_t crc = param->init;
 
   for (size_t i = 0; i < size; i++) {
     uint8_t v = param->reflect_in ? reflect(buf[i], 8) : buf[i];
 
-    crc = crc ^ (v << (param->bitwidth - 8));
+    crc = crc ^ ((uint64_t)v << (param->bitwidth - 8));
 
     //printf("%08x\n", crc);
 
@@ -151,8 +162,8 @@ uint64_t crc_generic(struct crc_info *param, const uint8_t *buf, size_t size) {
 void crc_datapath1(struct crc_info *param, uint64_t *crc, uint64_t topbitmask, uint64_t bitmask, bool v);
 
 uint64_t crc_generic_unrolled(struct crc_info *param, const uint8_t *buf, size_t size) { 
-  uint64_t bitmask = (1UL << param->bitwidth) - 1;
-  uint64_t topbitmask = 1UL << (param->bitwidth-1);
+  uint64_t bitmask = crc_bitmask(param->bitwidth);
+  uint64_t topbitmask = 1ULL << (param->bitwidth-1);
   uint64_t crc = param->init;
 
   for (size_t i = 0; i < size; i++) {
@@ -163,7 +174,9 @@ uint64_t crc_generic_unrolled(struct crc_info *param, const uint8_t *buf, size_t
     for (int j = 0; j < 8; j++) {
       int bit = !!(v & (1 << b));
       crc_datapath1(param, &crc, topbitmask, bitmask, bit);
-      printf("%d.%d: crc=%08x b=%d j=%d\n", i, j, crc, bit & 1, b);
+#ifdef CRC_TRACE
+      printf("%zu.%d: crc=%08llx b=%d j=%d\n", i, j, (unsigned long long)crc, bit & 1, b);
+#endif
       b += dir;
     }
 
@@ -191,6 +204,20 @@ void crc_datapath1(struct crc_info *param, uint64_t *crc, uint64_t topbitmask, u
   *crc = isset ? (crc_shifted ^ param->poly) : crc_shifted;
 }
 
+// Batch entry point for the fuzzer (src/crc_fuzz.py), loaded with ctypes.
+// Message i is buf[offsets[i]] up to buf[offsets[i+1]], so offsets has
+// count+1 entries. bitwise picks crc_generic_unrolled over crc_generic.
+void crc_batch(struct crc_info *param, const uint8_t *buf, const uint64_t *offsets,
+    size_t count, uint64_t *out, int bitwise) {
+  for (size_t i = 0; i < count; i++) {
+    const uint8_t *msg = buf + offsets[i];
+    size_t size = offsets[i+1] - offsets[i];
+
+    out[i] = bitwise ? crc_generic_unrolled(param, msg, size) : crc_generic(param, msg, size);
+  }
+}
+
+#ifndef CRC_LIBRARY
 int main(int argc, char *argv[])
 {
   const char *message = "123456789";
@@ -206,15 +233,16 @@ int main(int argc, char *argv[])
 
   for (size_t i = 0; i < sizeof(configs)/sizeof(configs[0]); i++) {
     struct crc_info *param = &configs[i];
-    uint64_t result = crc_generic_unrolled(param, message, strlen(message));
+    uint64_t result = crc_generic_unrolled(param, (const uint8_t *)message, strlen(message));
 
     const char * check_result = (param->check != result) ? "FAIL" : "PASS";
 
     if (default_message)
-      printf("%s: %08X [%s]\n", param->name, result, check_result);
+      printf("%s: %08llX [%s]\n", param->name, (unsigned long long)result, check_result);
     else
-      printf("%s: %08X\n", param->name, result);
+      printf("%s: %08llX\n", param->name, (unsigned long long)result);
   }
 
   return 0;
 }
+#endif
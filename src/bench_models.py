@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Host throughput benchmarks for the Python reference models.
+#
+# Sweeps message size (1 B to 1 MiB) and CRC bitwidth over the golden
+# models and testbench helpers, reporting seconds and CPU time per byte and
+# peak RSS. Results are written as JSON and CSV so runs can be compared.
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import time
+
+from crc_reference import *
+
+# 1 B to 1 MiB in powers of 4
+BENCH_SIZES = [4**i for i in range(11)]
+
+# the bit serial model and pack_nibbles are too slow to sweep past this
+SLOW_MAX_BYTES = 1 << 16
+
+def peak_rss_kb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def bench_configs(wide=False):
+    # first catalogue entry for every bitwidth the design supports, and the
+    # 40/64/82-bit ones only the models handle when wide is set
+    configs = {}
+    for name, config in list(CRC_TABLE.items()) + (list(CRC_TABLE_WIDE.items()) if wide else []):
+        configs.setdefault(config.bitwidth, name)
+
+    return [configs[bitwidth] for bitwidth in sorted(configs)]
+
+def write_bench_report(rows, prefix):
+    """Write benchmark rows (a list of flat dicts) to prefix.json and prefix.csv."""
+    os.makedirs(os.path.dirname(os.path.abspath(prefix)), exist_ok=True)
+
+    with open(prefix + ".json", "w") as fp:
+        json.dump(rows, fp, indent=2)
+
+    fields = []
+    for row in rows:
+        fields += [k for k in row if k not in fields]
+
+    with open(prefix + ".csv", "w", newline="") as fp:
+        writer = csv.DictWriter(fp, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def timeit(func, repeat, budget):
+    """Best wall and CPU time of func over at most `repeat` runs or `budget` seconds."""
+    best_wall = best_cpu = None
+    start = time.perf_counter()
+
+    for i in range(repeat):
+        wall, cpu = time.perf_counter(), time.process_time()
+        func()
+        wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+
+        best_wall = wall if best_wall is None else min(best_wall, wall)
+        best_cpu = cpu if best_cpu is None else min(best_cpu, cpu)
+
+        if time.perf_counter() - start > budget:
+            break
+
+    return best_wall, best_cpu
+
+def model_benchmarks(crc_name, message):
+    config = get_config(crc_name)
+    benches = [
+        ("golden_crc", lambda: golden_crc(crc_name, message)),
+        ("message_schedule", lambda: message_schedule(message)),
+        ("reflect", lambda: [reflect(c, config.bitwidth) for c in message]),
+    ]
+
+    if len(message) <= SLOW_MAX_BYTES:
+        nibbles = [n for c in message for n in pack_to_nibbles(c, 8)]
+        benches.append(("golden_crc_bitwise", lambda: golden_crc_bitwise(crc_name, message)))
+        benches.append(("pack_nibbles", lambda: pack_nibbles(*nibbles)))
+
+    if config.bitwidth > 64:
+        return benches
+
+    try:
+        import numpy as np
+        batch = np.frombuffer(message, dtype=np.uint8).reshape(1, -1)
+        benches.append(("golden_crc_batch", lambda: golden_crc_batch(crc_name, batch)))
+    except ImportError:
+        pass
+
+    return benches
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Python CRC models")
+    parser.add_argument("--max-bytes", type=int, default=BENCH_SIZES[-1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=2.0,
+            help="seconds to spend repeating a single measurement")
+    parser.add_argument("-o", "--output", default="bench_results/models",
+            help="report path prefix (.json and .csv are appended)")
+    args = parser.parse_args()
+
+    rows = []
+    for crc_name in bench_configs(wide=True):
+        for size in [s for s in BENCH_SIZES if s <= args.max_bytes]:
+            message = os.urandom(size)
+
+            for bench, func in model_benchmarks(crc_name, message):
+                wall, cpu = timeit(func, args.repeat, args.budget)
+                rows.append({
+                    "bench": bench,
+                    "crc_name": crc_name,
+                    "bitwidth": get_config(crc_name).bitwidth,
+                    "bytes": size,
+                    "host_s": wall,
+                    "cpu_s": cpu,
+                    "host_s_per_byte": wall / size,
+                    "bytes_per_s": size / wall if wall else 0,
+                    "peak_rss_kb": peak_rss_kb(),
+                })
+                print("%-20s %-20s %8d B %10.3f us/B" % (bench, crc_name, size, 1e6 * wall / size))
+
+    write_bench_report(rows, args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+import cocotb
+import os
+import time
+from cocotb.triggers import ClockCycles
+from cocotb.utils import get_sim_time
+
+from common_test import *
+from crc_decelerator_tb import bringup, stream_in_setup, stream_in_message, check_final_crc
+from bench_models import BENCH_SIZES, bench_configs, peak_rss_kb, write_bench_report
+from crc_profile import CLOCK_PERIOD_NS
+
+# Simulating 1 MiB takes ~10M cycles, so the default sweep stops earlier
+BENCH_MAX_BYTES = int(os.environ.get("BENCH_MAX_BYTES", 4096))
+BENCH_REPORT = os.environ.get("BENCH_REPORT", "bench_results/rtl")
+
+@cocotb.test()
+async def test_throughput(dut):
+    await bringup(dut)
+    rows = []
+
+    for crc_name in bench_configs():
+        config = CRC_TABLE[crc_name]
+
+        dut.cmd.value = CRC_CMD.CMD_SETUP
+        await ClockCycles(dut.clk, 1)
+        await stream_in_setup(dut, build_config(dut, crc_name))
+
+        for size in [s for s in BENCH_SIZES if s <= BENCH_MAX_BYTES]:
+            message = os.urandom(size)
+
+            dut.cmd.value = CRC_CMD.CMD_RESET
+            await ClockCycles(dut.clk, 2)
+
+            golden_time = time.perf_counter()
+            golden_crc_result = golden_crc(crc_name, message)
+            golden_time = time.perf_counter() - golden_time
+
+            sim_ns = get_sim_time("ns")
+            wall, cpu = time.perf_counter(), time.process_time()
+
+            await stream_in_message(dut, message)
+            await check_final_crc(dut, config, golden_crc_result)
+
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            sim_ns = get_sim_time("ns") - sim_ns
+            cycles = sim_ns // CLOCK_PERIOD_NS
+
+            rows.append({
+                "bench": "rtl_message",
+                "crc_name": crc_name,
+                "bitwidth": config.bitwidth,
+                "bytes": size,
+                "cycles": cycles,
+                "cycles_per_byte": cycles / size,
+                "sim_ns_per_byte": sim_ns / size,
+                "host_s": wall,
+                "cpu_s": cpu,
+                "host_s_per_byte": wall / size,
+                "golden_s_per_byte": golden_time / size,
+                # two clock edges per cycle
+                "clock_events_per_s": 2 * cycles / wall if wall else 0,
+                "peak_rss_kb": peak_rss_kb(),
+            })
+            dut._log.info("%s %d B: %.1f cycles/B %.3f us/B host", crc_name, size,
+                    cycles / size, 1e6 * wall / size)
+
+    write_bench_report(rows, BENCH_REPORT)
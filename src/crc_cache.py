@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+# Persistent cache of compiled simulator builds and golden CRC vectors.
+#
+# Builds are keyed by a hash of the Verilog sources, COMPILE_ARGS, TOPLEVEL
+# and the iverilog version, so a clean `make` can reuse sim.vvp when nothing
+# relevant changed. Golden vectors live in a sorted, memory-mapped file of
+# (config, message hash) -> crc records that is named after a hash of the
+# CRC tables. Both are bounded and evict the least recently used entries.
+#
+# Set CRC_CACHE=no to disable, CRC_CACHE_DIR to move the cache.
+import argparse
+import atexit
+import fcntl
+import hashlib
+import mmap
+import os
+import shutil
+import struct
+import subprocess
+import sys
+import time
+
+from crc_reference import *
+
+CACHE_ENABLED = os.environ.get("CRC_CACHE", "yes") != "no"
+CACHE_DIR = os.environ.get("CRC_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "crc_decelerator"))
+
+# Size bounds before least recently used entries are evicted
+MAX_BUILD_BYTES = int(os.environ.get("CRC_CACHE_MAX_BUILD_BYTES", 256 << 20))
+MAX_VECTORS = int(os.environ.get("CRC_CACHE_MAX_VECTORS", 1 << 20))
+
+#################################
+# Simulator builds
+#################################
+
+def simulator_version():
+    try:
+        proc = subprocess.run(["iverilog", "-V"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    except OSError:
+        return ""
+
+    return proc.stdout.decode(errors="replace").splitlines()[0] if proc.stdout else ""
+
+def build_key(sources, compile_args, toplevel, version=None):
+    if version is None:
+        version = simulator_version()
+
+    h = hashlib.sha256()
+    h.update(toplevel.encode() + b"\0" + " ".join(compile_args.split()).encode() + b"\0")
+    h.update(version.encode() + b"\0")
+
+    for source in sources:
+        h.update(source.encode() + b"\0")
+        with open(source, "rb") as fp:
+            h.update(hashlib.sha256(fp.read()).digest())
+
+    return h.hexdigest()
+
+def restore_build(key, build_dir):
+    cached = os.path.join(CACHE_DIR, "builds", key, "sim.vvp")
+    if not os.path.exists(cached):
+        return False
+
+    os.makedirs(build_dir, exist_ok=True)
+    target = os.path.join(build_dir, "sim.vvp")
+    shutil.copyfile(cached, target)
+
+    # newer than the sources so make skips compilation, and mark as recently used
+    now = time.time()
+    os.utime(target, (now, now))
+    os.utime(cached, (now, now))
+
+    return True
+
+def store_build(key, build_dir):
+    built = os.path.join(build_dir, "sim.vvp")
+    if not os.path.exists(built):
+        return False
+
+    cache_dir = os.path.join(CACHE_DIR, "builds", key)
+    os.makedirs(cache_dir, exist_ok=True)
+    shutil.copyfile(built, os.path.join(cache_dir, "sim.vvp.tmp"))
+    os.replace(os.path.join(cache_dir, "sim.vvp.tmp"), os.path.join(cache_dir, "sim.vvp"))
+    evict_builds()
+
+    return True
+
+def evict_builds(max_bytes=MAX_BUILD_BYTES):
+    builds_dir = os.path.join(CACHE_DIR, "builds")
+    builds = []
+
+    for key in os.listdir(builds_dir):
+        path = os.path.join(builds_dir, key, "sim.vvp")
+        if os.path.exists(path):
+            st = os.stat(path)
+            builds.append((st.st_mtime, st.st_size, key))
+
+    total = sum(size for _, size, _ in builds)
+    for mtime, size, key in sorted(builds):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(os.path.join(builds_dir, key), ignore_errors=True)
+        total -= size
+
+#################################
+# Golden vectors
+#################################
+
+def table_digest():
+    tables = list(CRC_TABLE.items()) + list(CRC_TABLE_FAKE.items())
+    return hashlib.sha256(repr(tables).encode()).hexdigest()[:16]
+
+def config_digest(config):
+    return hashlib.blake2b(repr(tuple(config)).encode(), digest_size=8).digest()
+
+def message_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+class GoldenVectorCache:
+    """Sorted, memory-mapped file of (config, message hash) -> crc records.
+
+    Lookups binary search the mapped file directly so opening the cache
+    costs nothing. New and hit records are remembered in memory and merged
+    into the file by flush(), which also evicts the records that were used
+    least recently once there are more than max_vectors. flush() re-reads
+    the file under a lock, so parallel shards keep each other's records.
+    """
+    MAGIC = b"CRCV"
+    HEADER = struct.Struct("<4sII")
+    # 24 byte key (config + message digest), crc, generation last used
+    RECORD = struct.Struct("<24sQI")
+
+    def __init__(self, path, max_vectors=MAX_VECTORS):
+        self.path = path
+        self.max_vectors = max_vectors
+        self.generation = 0
+        self.count = 0
+        self._map = None
+        self._new = {}
+        self._hits = set()
+
+        self._map = self._open(path)
+        if self._map is not None:
+            self.generation = self.HEADER.unpack_from(self._map)[2]
+            self.count = (len(self._map) - self.HEADER.size) // self.RECORD.size
+
+        self.generation += 1
+
+    @classmethod
+    def _open(cls, path):
+        if not os.path.exists(path) or os.path.getsize(path) < cls.HEADER.size:
+            return None
+
+        with open(path, "rb") as fp:
+            m = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, generation = cls.HEADER.unpack_from(m)
+        if magic != cls.MAGIC or version != 1:
+            m.close()
+            return None
+
+        return m
+
+    def _key(self, i):
+        offset = self.HEADER.size + i * self.RECORD.size
+        return self._map[offset:offset+24]
+
+    def _find(self, key):
+        if self._map is None:
+            return None
+
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        if lo < self.count and self._key(lo) == key:
+            return lo
+        return None
+
+    def get(self, config, data):
+        key = config_digest(config) + message_digest(data)
+
+        if key in self._new:
+            return self._new[key]
+
+        i = self._find(key)
+        if i is None:
+            return None
+
+        self._hits.add(key)
+        return self.RECORD.unpack_from(self._map, self.HEADER.size + i * self.RECORD.size)[1]
+
+    def put(self, config, data, crc):
+        self._new[config_digest(config) + message_digest(data)] = crc
+
+    def flush(self):
+        if not self._new and not self._hits:
+            return
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        with open(self.path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            # merge with what other processes flushed since this one opened it
+            records = {}
+            generation = self.generation
+            current = self._open(self.path)
+            if current is not None:
+                generation = max(generation, self.HEADER.unpack_from(current)[2])
+                for offset in range(self.HEADER.size, len(current) - self.RECORD.size + 1, self.RECORD.size):
+                    key, crc, used = self.RECORD.unpack_from(current, offset)
+                    records[key] = (crc, self.generation if key in self._hits else used)
+                current.close()
+
+            for key, crc in self._new.items():
+                records[key] = (crc, self.generation)
+
+            if len(records) > self.max_vectors:
+                keep = sorted(records.items(), key=lambda r: -r[1][1])[:self.max_vectors]
+                records = dict(keep)
+
+            tmp = self.path + ".%d.tmp" % os.getpid()
+            with open(tmp, "wb") as fp:
+                fp.write(self.HEADER.pack(self.MAGIC, 1, generation))
+                for key in sorted(records):
+                    crc, used = records[key]
+                    fp.write(self.RECORD.pack(key, crc, used))
+
+            if self._map is not None:
+                self._map.close()
+                self._map = None
+
+            os.replace(tmp, self.path)
+
+        self._new = {}
+        self._hits = set()
+
+_vector_cache = None
+
+def vector_cache():
+    global _vector_cache
+
+    if _vector_cache is None:
+        path = os.path.join(CACHE_DIR, "vectors", "golden_%s.bin" % table_digest())
+        _vector_cache = GoldenVectorCache(path)
+        atexit.register(_vector_cache.flush)
+
+    return _vector_cache
+
+def cached_golden_crc(crc_name, data):
+    if isinstance(data, str):
+        data = data.encode()
+
+    if not CACHE_ENABLED:
+        return golden_crc(crc_name, data)
+
+    config = get_config(crc_name)
+    crc = vector_cache().get(config, data)
+
+    if crc is None and crc_name in CRC_TABLE:
+        # the catalogue sweeps feed the same message to every config, so
+        # fill in all of them in one pass
+        for name, crc in golden_crc_all(data).items():
+            vector_cache().put(CRC_TABLE[name], data, crc)
+        crc = vector_cache().get(config, data)
+    elif crc is None:
+        crc = golden_crc(crc_name, data)
+        vector_cache().put(config, data, crc)
+
+    return crc
+
+def cached_golden_crc_batch(crc_name, messages):
+    """Like golden_crc_batch, only computing messages missing from the cache."""
+    if not CACHE_ENABLED:
+        return [int(crc) for crc in golden_crc_batch(crc_name, messages)]
+
+    config = get_config(crc_name)
+    cache = vector_cache()
+    crcs = [cache.get(config, data) for data in messages]
+    missing = [i for i, crc in enumerate(crcs) if crc is None]
+
+    if missing:
+        for i, crc in zip(missing, golden_crc_batch(crc_name, [messages[i] for i in missing])):
+            crcs[i] = int(crc)
+            cache.put(config, messages[i], crcs[i])
+
+    return crcs
+
+def main():
+    parser = argparse.ArgumentParser(description="Restore or store a cached simulator build")
+    parser.add_argument("action", choices=["restore-build", "store-build"])
+    parser.add_argument("--build-dir", default="sim_build")
+    parser.add_argument("--toplevel", required=True)
+    parser.add_argument("--compile-args", default="")
+    parser.add_argument("sources", nargs="+")
+    args = parser.parse_args()
+
+    if not CACHE_ENABLED:
+        return 0
+
+    key = build_key(args.sources, args.compile_args, args.toplevel)
+
+    if args.action == "restore-build":
+        if restore_build(key, args.build_dir):
+            print("crc_cache: reusing %s build %s" % (args.toplevel, key[:12]))
+    else:
+        store_build(key, args.build_dir)
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+# Functional coverage and coverage driven stimulus for the decelerator.
+#
+# Coverage is kept as bins per group: CRC bitwidth, reflect_in/out combo,
+# message length class, payload kind and pairs of consecutive commands
+# (e.g. FINAL -> MESSAGE to resume, SETUP -> RESET partway through the
+# config nibbles). The
+# generator picks configs, lengths and commands that still have empty bins
+# and cuts payloads from a pool of random bytes generated in bulk.
+import random
+from collections import OrderedDict
+
+from crc_reference import *
+
+# (min, max) message lengths per class
+LENGTH_CLASSES = [(0, 0), (1, 1), (2, 3), (4, 7), (8, 15), (16, 63)]
+PAYLOAD_KINDS = ["zeros", "ones", "random"]
+
+# Commands as the testbench issues them. SETUP is always followed by RESET,
+# the setup -> reset bin only counts a RESET issued partway through the
+# config nibbles, which the chip holds off until it has taken the rest of
+# the config from data_in
+ACTIONS = ["setup", "reset", "message", "final"]
+NEXT_ACTIONS = {
+    "setup": ["reset"],
+    # a FINAL straight after RESET reads back the empty message
+    "reset": ["message", "final", "setup", "reset"],
+    # MESSAGE -> MESSAGE continues the message, -> RESET/SETUP abandons it
+    "message": ["message", "final", "reset", "setup"],
+    # FINAL -> MESSAGE resumes, FINAL -> FINAL reads back again
+    "final": ["message", "final", "reset", "setup"],
+}
+TRANSITIONS = [(a, b) for a in ACTIONS for b in NEXT_ACTIONS[a]]
+
+# pool of random payload bytes, refilled in bulk when used up
+PAYLOAD_POOL_BYTES = 1 << 16
+
+def length_class(length):
+    for lo, hi in LENGTH_CLASSES:
+        if lo <= length <= hi:
+            return "%d-%d" % (lo, hi) if lo != hi else "%d" % lo
+
+    return "%d+" % LENGTH_CLASSES[-1][1]
+
+class Coverage:
+    def __init__(self, configs):
+        self.bins = OrderedDict([
+            ("bitwidth", OrderedDict((w, 0) for w in sorted(set(c.bitwidth for c in configs)))),
+            ("reflect", OrderedDict((r, 0) for r in sorted(set((c.reflect_in, c.reflect_out) for c in configs)))),
+            ("length", OrderedDict((length_class(lo), 0) for lo, hi in LENGTH_CLASSES)),
+            ("payload", OrderedDict((kind, 0) for kind in PAYLOAD_KINDS)),
+            ("transition", OrderedDict((t, 0) for t in TRANSITIONS)),
+        ])
+
+    def hit(self, group, key):
+        if key in self.bins[group]:
+            self.bins[group][key] += 1
+
+    def sample_config(self, config):
+        self.hit("bitwidth", config.bitwidth)
+        self.hit("reflect", (config.reflect_in, config.reflect_out))
+
+    def sample_message(self, message, kind):
+        self.hit("length", length_class(len(message)))
+        if len(message):
+            self.hit("payload", kind)
+
+    def missing(self, group):
+        return [key for key, count in self.bins[group].items() if count == 0]
+
+    def complete(self):
+        return not any(self.missing(group) for group in self.bins)
+
+    def summary(self):
+        total = sum(len(bins) for bins in self.bins.values())
+        hit = sum(count > 0 for bins in self.bins.values() for count in bins.values())
+        return hit, total
+
+    def report(self):
+        lines = []
+        for group, bins in self.bins.items():
+            hit = sum(count > 0 for count in bins.values())
+            lines.append("%-10s %3d/%-3d missing %s" % (group, hit, len(bins), self.missing(group) or "-"))
+
+        return lines
+
+class StimulusGenerator:
+    """Generates lists of commands biased towards empty bins.
+
+    Each list starts with ("setup", crc_name) and ends with ("final", None),
+    messages are ("message", bytes) and the rest ("reset", None) or
+    ("final", None). Every setup is followed by a reset. A mid-list setup
+    can be ("setup_abort", (crc_name, nibbles)) instead, which only sends
+    the first nibbles of the config before the reset. Coverage is sampled
+    as the actions are generated.
+    """
+
+    def __init__(self, configs=CRC_TABLE, seed=0, coverage=None):
+        self.configs = configs
+        self.rng = random.Random(seed)
+        self.coverage = Coverage(configs.values()) if coverage is None else coverage
+        self._pool = b""
+        self._pool_offset = 0
+        # last command of the previous action list
+        self._last = None
+
+    def _random_bytes(self, length):
+        if self._pool_offset + length > len(self._pool):
+            self._pool = self.rng.randbytes(max(PAYLOAD_POOL_BYTES, length))
+            self._pool_offset = 0
+
+        self._pool_offset += length
+        return self._pool[self._pool_offset - length:self._pool_offset]
+
+    def _pick(self, choices, group, key=lambda c: c):
+        # prefer choices that land in an empty bin
+        unhit = [c for c in choices if self.coverage.bins[group].get(key(c)) == 0]
+        return self.rng.choice(unhit or choices)
+
+    def pick_config(self):
+        names = list(self.configs.keys())
+        missing_widths = set(self.coverage.missing("bitwidth"))
+        missing_reflect = set(self.coverage.missing("reflect"))
+
+        def score(name):
+            c = self.configs[name]
+            return (c.bitwidth in missing_widths) + ((c.reflect_in, c.reflect_out) in missing_reflect)
+
+        best = max(score(name) for name in names)
+        return self.rng.choice([name for name in names if score(name) == best])
+
+    def message(self):
+        lo, hi = self._pick(LENGTH_CLASSES, "length", lambda c: length_class(c[0]))
+        kind = self._pick(PAYLOAD_KINDS, "payload")
+        length = self.rng.randint(lo, hi)
+
+        if kind == "zeros":
+            message = bytes(length)
+        elif kind == "ones":
+            message = b"\xff" * length
+        else:
+            message = self._random_bytes(length)
+
+        self.coverage.sample_message(message, kind)
+        return message
+
+    def setup(self, actions, abort=False):
+        crc_name = self.pick_config()
+        self.coverage.sample_config(self.configs[crc_name])
+
+        if self._last is not None:
+            self.coverage.hit("transition", (self._last, "setup"))
+
+        if abort:
+            # past the bitwidth so the chip still expects the same number of nibbles
+            count = self.rng.randrange(2, len(config_nibbles(self.configs[crc_name])))
+            self.coverage.hit("transition", ("setup", "reset"))
+            actions += [("setup_abort", (crc_name, count)), ("reset", None)]
+        else:
+            actions += [("setup", crc_name), ("reset", None)]
+
+    def actions(self, max_actions=10):
+        """One action list, SETUP can also appear mid-list to switch config."""
+        actions = []
+        self.setup(actions)
+
+        while len(actions) < max_actions:
+            prev = actions[-1][0]
+            action = self._pick(NEXT_ACTIONS[prev], "transition", lambda a: (prev, a))
+
+            if action == "setup":
+                self._last = prev
+                self.setup(actions, abort=self.coverage.bins["transition"][("setup", "reset")] == 0
+                        or self.rng.random() < 0.25)
+            else:
+                self.coverage.hit("transition", (prev, action))
+                actions.append((action, self.message() if action == "message" else None))
+
+        if actions[-1][0] != "final":
+            self.coverage.hit("transition", (actions[-1][0], "final"))
+            actions.append(("final", None))
+
+        self._last = "final"
+        return actions
+
+    def tests(self, max_tests=1000, max_actions=10):
+        """Yield action lists until every bin is hit or max_tests is reached."""
+        for i in range(max_tests):
+            if self.coverage.complete():
+                return
+
+            yield self.actions(max_actions)
@@ -0,0 +1,121 @@
+import cocotb
+import random
+import time
+from cocotb.clock import Clock
+from cocotb.triggers import RisingEdge, FallingEdge, Combine
+
+from common_test import *
+from crc_cache import cached_golden_crc_batch
+from crc_host import CrcHost
+from crc_profile import CLOCK_PERIOD_NS, sim_time_ns
+
+async def bringup(dut):
+    cores = [dut.cores[i] for i in range(len(dut.cores))]
+    for core in cores:
+        core.cmd.value = 0
+        core.data_in.value = 0
+
+    cocotb.start_soon(Clock(dut.clk, CLOCK_PERIOD_NS, units="ns").start())
+    await RisingEdge(dut.clk)
+
+    dut.rst.value = 1
+    await RisingEdge(dut.clk)
+
+    dut.rst.value = 0
+    await RisingEdge(dut.clk)
+
+    for core in cores:
+        assert core.io_out.value == 0
+
+    return cores
+
+def job_cycles(crc_name, message):
+    return 1 + len(message) * MESSAGE_BYTE_CYCLES + FINAL_BYTE_CYCLES * ((get_config(crc_name).bitwidth + 7) // 8)
+
+def assign_jobs(jobs, count):
+    """Split (crc_name, message) jobs over count cores.
+
+    All jobs of a config go to the same core so it is only set up once, and
+    configs are handed out largest first to the least loaded core.
+    """
+    by_config = {}
+    for crc_name, message in jobs:
+        by_config.setdefault(crc_name, []).append((crc_name, message))
+
+    setup_cycles = lambda crc_name: len(setup_schedule(config_bitstream(get_config(crc_name)).nibbles))
+    costs = sorted(((setup_cycles(crc_name) + sum(job_cycles(*job) for job in config_jobs), crc_name)
+        for crc_name, config_jobs in by_config.items()), reverse=True)
+
+    shards = [[] for i in range(count)]
+    loads = [0] * count
+    for cost, crc_name in costs:
+        i = loads.index(min(loads))
+        shards[i] += by_config[crc_name]
+        loads[i] += cost
+
+    return shards
+
+async def run_core(core, clk, jobs):
+    """Run jobs back to back on one core as a single host schedule and
+    return the CRC read back for each."""
+    host = CrcHost(None)
+    queued = [host.queue(crc_name, message) for crc_name, message in jobs]
+    readback = set(i for job in queued for i in job.readback)
+
+    edge, falling = RisingEdge(clk), FallingEdge(clk)
+    cmd, data_in = core.cmd, core.data_in
+    cur_cmd = cur_data_in = None
+    io_out = {}
+
+    for i, v in enumerate(bytes(host.schedule)):
+        if v >> 4 != cur_cmd:
+            cur_cmd = v >> 4
+            cmd.value = cur_cmd
+        if v & 0xf != cur_data_in:
+            cur_data_in = v & 0xf
+            data_in.value = cur_data_in
+
+        await edge
+
+        # only readback cycles wait for io_out to settle
+        if i in readback:
+            await falling
+            io_out[i] = int(core.io_out.value)
+
+    return [sum(io_out[i] << (8*b) for b, i in enumerate(job.readback)) for job in queued]
+
+async def run_multi(dut, cores, jobs):
+    """Run jobs spread over every core concurrently, return {job: crc}."""
+    shards = assign_jobs(jobs, len(cores))
+    tasks = [cocotb.start_soon(run_core(core, dut.clk, shard)) for core, shard in zip(cores, shards) if shard]
+    await Combine(*tasks)
+
+    results = {}
+    for shard, task in zip([s for s in shards if s], tasks):
+        results.update(zip(shard, task.result()))
+
+    return results
+
+@cocotb.test()
+async def test_multi_core_catalogue(dut):
+    # every catalogue CRC with a few random messages, spread over all cores
+    random.seed(5520117)
+    cores = await bringup(dut)
+
+    jobs = []
+    for crc_name in CRC_TABLE.keys():
+        for n in range(4):
+            jobs.append((crc_name, bytes(random.choice(range(0, 0x100)) for i in range(random.randint(0, 16)))))
+
+    start_ns, start_wall = sim_time_ns(dut), time.perf_counter()
+    results = await run_multi(dut, cores, jobs)
+    cycles = (sim_time_ns(dut) - start_ns) // CLOCK_PERIOD_NS
+    wall = time.perf_counter() - start_wall
+
+    dut._log.info("%d jobs on %d cores in %d cycles, %.0f core cycles/s", len(jobs), len(cores),
+            cycles, cycles * len(cores) / wall)
+
+    for crc_name in CRC_TABLE.keys():
+        messages = [m for name, m in jobs if name == crc_name]
+        for message, golden in zip(messages, cached_golden_crc_batch(crc_name, messages)):
+            assert results[(crc_name, message)] == golden, "%s %s" % (crc_name, message.hex())
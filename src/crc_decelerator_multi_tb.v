@@ -0,0 +1,45 @@
+`default_nettype none
+`timescale 1ns/1ps
+
+`ifndef MULTI_CORES
+    `define MULTI_CORES 8
+`endif
+
+// CORES independent decelerators on one clock and reset, each with its own
+// cmd/data_in/io_out, driven concurrently by crc_decelerator_multi_tb.py
+module crc_decelerator_multi_tb #(
+  parameter CORES = `MULTI_CORES
+)(
+    input clk,
+    input rst
+   );
+
+    // waveforms are only dumped with +waves=<file> (make CRC_TRACE=vcd or fst)
+    reg [8*64-1:0] waves_file;
+
+    initial begin
+        if ($value$plusargs("waves=%s", waves_file)) begin
+            $dumpfile (waves_file);
+            $dumpvars (0, crc_decelerator_multi_tb);
+        end
+    end
+
+    genvar i;
+    generate for (i = 0; i < CORES; i = i + 1)
+      begin: cores
+        reg [1:0] cmd = 0;
+        reg [3:0] data_in = 0;
+        wire [7:0] io_out;
+
+        granth_crc_decelerator crc (
+            `ifdef GL_TEST
+                .vccd1( 1'b1),
+                .vssd1( 1'b0),
+            `endif
+            .io_in({data_in, cmd, rst, clk}),
+            .io_out(io_out)
+        );
+      end
+    endgenerate
+
+endmodule
@@ -6,12 +6,28 @@ module crc_decelerator_tb(
     output [7:0] io_out
    );
 
+    // Waveforms are only dumped with +waves=<file> (make CRC_TRACE=vcd or
+    // fst), and then only while dump_enable is set, which crc_trace.py does
+    // for the tests selected by CRC_TRACE_TESTS
+    reg [8*64-1:0] waves_file;
+    reg waves = 0;
+    reg dump_enable = 0;
+
     initial begin
-        $dumpfile ("crc_decelerator_tb.vcd");
-        $dumpvars (0, crc_decelerator_tb);
-        #1;
+        if ($value$plusargs("waves=%s", waves_file)) begin
+            waves = 1;
+            $dumpfile (waves_file);
+            $dumpvars (0, crc_decelerator_tb);
+            $dumpoff;
+        end
     end
 
+    always @(dump_enable)
+        if (waves) begin
+            if (dump_enable) $dumpon;
+            else $dumpoff;
+        end
+
     wire clk, rst;
     wire [1:0] cmd;
     wire [3:0] data_in;
@@ -19,8 +35,46 @@ module crc_decelerator_tb(
     // better names for tb
     assign clk = io_in[0];
     assign rst = io_in[1];
+
+`ifdef STIMULUS_ROM
+    `ifndef STIMULUS_DEPTH
+        `define STIMULUS_DEPTH (1 << 20)
+    `endif
+
+    // Replays a {cmd, data_in} byte per cycle from the file named by
+    // stimulus_file without any Python involvement. Python bumps
+    // stimulus_load to (re)load the file, then sets stimulus_len and zeroes
+    // stimulus_pc to start. stimulus_done rises once the last entry has been
+    // clocked, handing cmd/data_in back to io_in.
+    reg [7:0] stimulus [0:`STIMULUS_DEPTH-1];
+    reg [8*256-1:0] stimulus_file = "stimulus.hex";
+    reg [31:0] stimulus_load = 0;
+    reg [31:0] stimulus_len = 0;
+    reg [31:0] stimulus_pc = 0;
+    reg stimulus_done = 0;
+
+    wire stimulus_active = stimulus_len != 0 && !stimulus_done;
+    wire [7:0] stimulus_word = stimulus[stimulus_pc];
+
+    always @(stimulus_load)
+        if (stimulus_load != 0)
+            $readmemh(stimulus_file, stimulus);
+
+    always @(posedge clk) begin
+        if (stimulus_active) begin
+            if (stimulus_pc == stimulus_len - 1)
+                stimulus_done <= 1;
+            else
+                stimulus_pc <= stimulus_pc + 1;
+        end
+    end
+
+    assign cmd = stimulus_active ? stimulus_word[5:4] : io_in[3:2];
+    assign data_in = stimulus_active ? stimulus_word[3:0] : io_in[7:4];
+`else
     assign cmd = io_in[3:2];
     assign data_in = io_in[7:4];
+`endif
 
     // instantiate the DUT
     granth_crc_decelerator crc (
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# Generate the wavedrom timing diagrams of the README from the Python model.
+#
+# The setup bitstream and check message of any catalogue CRC are run through
+# CrcDeceleratorModel and every cycle is sampled straight into wavedrom
+# JSON, no simulator needed. A recorded stimulus (sim_build/stimulus_<pid>.hex
+# from MessageDriver, one schedule byte per line) can be drawn the same way.
+# --svg renders the JSON with the wavedrom package, if installed, and gives
+# the SVGs a white background with diagram/set_bg_white.py.
+#
+# Output goes to diagram_build/. The committed diagram/ files used by the
+# README are only overwritten when asked for with -o ../diagram.
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from crc_reference import *
+from crc_model import CrcDeceleratorModel
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DIAGRAM_DIR = os.path.join(os.path.dirname(SRC_DIR), "diagram")
+BUILD_DIR = os.path.join(SRC_DIR, "diagram_build")
+
+WAVE_CONFIG = {"hscale": 3, "skin": "narrow"}
+
+# (label, wavedrom colour) per enum value, "=" is the plain data colour
+CMD_WAVES = {
+    CRC_CMD.CMD_RESET: ("RESET", "9"),
+    CRC_CMD.CMD_SETUP: ("SETUP", "7"),
+    CRC_CMD.CMD_MESSAGE: ("MESSAGE", "="),
+    CRC_CMD.CMD_FINAL: ("FINAL", "="),
+}
+SETUP_FSM_WAVES = {
+    SETUP_FSM.SETUP_START: ("START", "7"),
+    SETUP_FSM.SETUP_CONFIG_LO: ("CONLO", "4"),
+    SETUP_FSM.SETUP_CONFIG_HI: ("CONHI", "3"),
+    SETUP_FSM.SETUP_POLY_N: ("POLY", "5"),
+    SETUP_FSM.SETUP_INIT_N: ("INIT", "6"),
+    SETUP_FSM.SETUP_XOR_N: ("XOR", "8"),
+    SETUP_FSM.SETUP_DONE: ("DONE", "9"),
+}
+CRC_STATE_WAVES = {
+    CRC_STATE.CRC_INIT: ("INIT", "="),
+    CRC_STATE.CRC_DATA_LO: ("DLO", "3"),
+    CRC_STATE.CRC_DATA_HI: ("DHI", "4"),
+    CRC_STATE.CRC_SHIFTING: ("SHIFT", "5"),
+}
+
+# cycles of each message byte drawn, the rest of the byte is a gap
+MESSAGE_BYTE_SHOWN = 3
+
+def diagram_slug(crc_name):
+    return crc_name.lower().replace("-", "").replace("/", "_")
+
+def record(model, schedule, signals):
+    """Run schedule on the model, sampling each signal once per cycle.
+
+    Column i holds the inputs driven in cycle i and the registers as they
+    are during it, i.e. after the edge ending cycle i-1.
+    """
+    trace = {name: [] for name in signals}
+
+    for v in schedule:
+        model.cmd.value = v >> 4
+        model.data_in.value = v & 0xf
+
+        for name, get in signals.items():
+            trace[name].append(get(model))
+        model.step()
+
+    return trace
+
+def model_signals(names):
+    getters = {
+        "cmd": lambda m: m.cmd.value,
+        "data_in": lambda m: m.data_in.value,
+        "crc_result": lambda m: m.crc_result(),
+    }
+    return {name: getters.get(name, lambda m, name=name: getattr(m.crc, name).value) for name in names}
+
+def wave(name, values, columns, fmt=None, enum=None):
+    """One wavedrom signal drawn over columns, a list of cycle indices with
+    None for a gap."""
+    chars, data = [], []
+    last = None
+
+    for i in columns:
+        if i is None:
+            chars.append("|")
+            continue
+
+        v = values[i]
+        if v == last:
+            chars.append(".")
+        elif enum is not None:
+            label, colour = enum[v]
+            chars.append(colour)
+            data.append(label)
+        elif fmt is None:
+            chars.append(str(v))
+        else:
+            chars.append("=")
+            data.append(fmt % v)
+        last = v
+
+    signal = {"name": name, "wave": "".join(chars)}
+    if data:
+        signal["data"] = " ".join(data)
+    return signal
+
+def clock_wave(columns):
+    return {"name": "clock", "wave": "P" + "".join("|" if i is None else "." for i in columns[1:])}
+
+def wavedrom(title, signals, columns):
+    return {
+        "signal": [clock_wave(columns)] + signals,
+        "config": WAVE_CONFIG,
+        "head": {"text": title, "tick": 0, "every": 2},
+    }
+
+def setup_diagram(crc_name, model=None):
+    config = get_config(crc_name)
+    model = model or CrcDeceleratorModel()
+    model.reset()
+
+    schedule = setup_schedule(config_bitstream(config).nibbles)
+    trace = record(model, schedule, model_signals(["cmd", "data_in", "setup_fsm", "crc_poly",
+        "crc_init", "crc_xor", "crc_reflect_in", "crc_reflect_out"]))
+    columns = list(range(len(schedule)))
+    reg = "0x%%0%dx" % ((config.bitwidth + 3) // 4)
+
+    return wavedrom("%s Setup Bitstream" % crc_name, [
+        wave("cmd", trace["cmd"], columns, enum=CMD_WAVES),
+        wave("data_in", trace["data_in"], columns, "0x%x"),
+        wave("setup_fsm", trace["setup_fsm"], columns, enum=SETUP_FSM_WAVES),
+        wave("crc_poly", trace["crc_poly"], columns, reg),
+        wave("crc_init", trace["crc_init"], columns, reg),
+        wave("crc_xor", trace["crc_xor"], columns, reg),
+        wave("crc_reflect_in", trace["crc_reflect_in"], columns),
+        wave("crc_reflect_out", trace["crc_reflect_out"], columns),
+    ], columns)
+
+def message_columns(lead, message_len, tail, shown_bytes):
+    """Cycle indices of a message diagram, drawing only the first
+    MESSAGE_BYTE_SHOWN cycles of the shown bytes with gaps in between."""
+    columns = list(range(lead))
+
+    for b in range(message_len):
+        if b not in shown_bytes:
+            continue
+        if columns and columns[-1] is not None and columns[-1] != lead + b * MESSAGE_BYTE_CYCLES - 1:
+            columns.append(None)
+        start = lead + b * MESSAGE_BYTE_CYCLES
+        columns += range(start, start + MESSAGE_BYTE_SHOWN)
+
+    end = lead + message_len * MESSAGE_BYTE_CYCLES
+    if columns[-1] != end - 1:
+        columns.append(None)
+
+    return columns + list(range(end, end + tail))
+
+def message_diagram(crc_name, message=CRC_CHECK_STRING, model=None):
+    config = get_config(crc_name)
+    if isinstance(message, str):
+        message = message.encode()
+
+    model = model or CrcDeceleratorModel()
+    model.reset()
+    model.run_schedule(setup_schedule(config_bitstream(config).nibbles))
+
+    reset = bytes([schedule_entry(CRC_CMD.CMD_RESET, 0)] * 2)
+    # the result byte 0 readback, held one more cycle to show the final value
+    final = final_schedule(8) + final_schedule(8)[-1:]
+    schedule = reset + message_schedule(message) + final
+
+    trace = record(model, schedule, model_signals(["cmd", "data_in", "crc_state", "crc_result"]))
+    shown = {0, 1, len(message) - 1}
+    columns = message_columns(len(reset) + 1, len(message), len(final), shown)
+    reg = "0x%%0%dx" % ((config.bitwidth + 3) // 4)
+
+    return wavedrom("%s %s Check Message" % (crc_name, message.decode(errors="replace")), [
+        wave("cmd", trace["cmd"], columns, enum=CMD_WAVES),
+        wave("data_in", trace["data_in"], columns, "0x%x"),
+        wave("crc_state", trace["crc_state"], columns, enum=CRC_STATE_WAVES),
+        wave("crc_result", trace["crc_result"], columns, reg),
+    ], columns)
+
+def stimulus_diagram(path, title):
+    """Draw a recorded stimulus file replayed on the model from reset."""
+    with open(path) as fp:
+        schedule = bytes(int(line, 16) for line in fp if line.strip())
+
+    model = CrcDeceleratorModel()
+    model.reset()
+    trace = record(model, schedule, model_signals(["cmd", "data_in", "setup_fsm", "crc_state", "crc_result"]))
+    columns = list(range(len(schedule)))
+
+    return wavedrom(title, [
+        wave("cmd", trace["cmd"], columns, enum=CMD_WAVES),
+        wave("data_in", trace["data_in"], columns, "0x%x"),
+        wave("setup_fsm", trace["setup_fsm"], columns, enum=SETUP_FSM_WAVES),
+        wave("crc_state", trace["crc_state"], columns, enum=CRC_STATE_WAVES),
+        wave("crc_result", trace["crc_result"], columns, "0x%x"),
+    ], columns)
+
+def write_diagram(path, diagram):
+    with open(path, "w") as fp:
+        json.dump(diagram, fp, indent=4)
+        fp.write("\n")
+
+def render_svgs(paths):
+    import wavedrom
+
+    svgs = []
+    for path in paths:
+        svg = os.path.splitext(path)[0] + ".svg"
+        wavedrom.render_file(path, svg)
+        svgs.append(svg)
+
+    subprocess.run([sys.executable, os.path.join(DIAGRAM_DIR, "set_bg_white.py")] + svgs, check=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate wavedrom timing diagrams from the Python model")
+    parser.add_argument("crcs", nargs="*", default=["CRC-16/USB"], help="catalogue names of the CRCs")
+    parser.add_argument("--all", action="store_true", help="every catalogue CRC")
+    parser.add_argument("--stimulus", help="draw a recorded stimulus hex file instead")
+    parser.add_argument("-o", "--output-dir", default=BUILD_DIR,
+            help="where to write, %s holds the README diagrams" % os.path.relpath(DIAGRAM_DIR))
+    parser.add_argument("--svg", action="store_true", help="also render SVGs (needs the wavedrom package)")
+    args = parser.parse_args()
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    written = []
+
+    if args.stimulus:
+        path = os.path.join(args.output_dir, os.path.splitext(os.path.basename(args.stimulus))[0] + ".json")
+        write_diagram(path, stimulus_diagram(args.stimulus, os.path.basename(args.stimulus)))
+        written.append(path)
+    else:
+        model = CrcDeceleratorModel()
+        for crc_name in (CRC_TABLE.keys() if args.all else args.crcs):
+            slug = diagram_slug(crc_name)
+            for kind, diagram in [("setup", setup_diagram(crc_name, model)), ("message", message_diagram(crc_name, model=model))]:
+                path = os.path.join(args.output_dir, "%s_%s.json" % (slug, kind))
+                write_diagram(path, diagram)
+                written.append(path)
+
+    if args.svg:
+        render_svgs(written)
+
+    print("%d diagrams written to %s" % (len(written), args.output_dir))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# Differential fuzzing of the C model (model/crc32.c) against the Python
+# reference.
+#
+# A seeded corpus of random messages is generated per config as one flat
+# buffer plus offsets and handed in a single call to both crc_batch() in the
+# C library, loaded with ctypes, and golden_crc_batch(). Any message the
+# implementations disagree on is shrunk with delta debugging to a small
+# reproducer. --save-corpus writes a sample of the corpus for
+# test_fuzz_corpus in crc_decelerator_tb.py to replay on the RTL (make fuzz).
+# It exits 0 then, even with reproducers, so make goes on to the RTL replay
+# and fails on its results.
+import argparse
+import ctypes
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+from crc_reference import *
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "model")
+C_LIBRARY = os.path.join(MODEL_DIR, "libcrc32.so")
+
+#################################
+# C model
+#################################
+
+class CrcInfo(ctypes.Structure):
+    # struct crc_info in crc32.c
+    _fields_ = [
+        ("name", ctypes.c_char_p),
+        ("bitwidth", ctypes.c_uint),
+        ("check", ctypes.c_uint64),
+        ("poly", ctypes.c_uint64),
+        ("init", ctypes.c_uint64),
+        ("reflect_in", ctypes.c_uint8),
+        ("reflect_out", ctypes.c_uint8),
+        ("xorout", ctypes.c_uint64),
+    ]
+
+class CModel:
+    """ctypes wrapper around crc_batch() in libcrc32.so."""
+
+    def __init__(self, path=C_LIBRARY, build=True):
+        if build:
+            # make only rebuilds when crc32.c changed
+            subprocess.run(["make", "-s", "-C", MODEL_DIR, "libcrc32.so", "CC=" + os.environ.get("CC", "cc")], check=True)
+
+        self.lib = ctypes.CDLL(path)
+        self.lib.crc_batch.restype = None
+        self.lib.crc_batch.argtypes = [ctypes.POINTER(CrcInfo), ctypes.c_void_p, ctypes.c_void_p,
+                ctypes.c_size_t, ctypes.c_void_p, ctypes.c_int]
+
+    def crc_batch(self, config, flat, offsets, bitwise=True):
+        """CRC of every message in flat, split by offsets like golden_crc_batch."""
+        import numpy as np
+
+        flat = np.ascontiguousarray(flat, dtype=np.uint8)
+        offsets = np.ascontiguousarray(offsets, dtype=np.uint64)
+        out = np.zeros(len(offsets) - 1, dtype=np.uint64)
+        info = CrcInfo(None, config.bitwidth, config.check, config.poly, config.init,
+                config.reflect_in, config.reflect_out, config.xorout)
+
+        self.lib.crc_batch(ctypes.byref(info), flat.ctypes.data, offsets.ctypes.data,
+                len(out), out.ctypes.data, int(bitwise))
+        return out
+
+    def crc(self, config, message, bitwise=True):
+        return int(self.crc_batch(config, bytearray(message), [0, len(message)], bitwise)[0])
+
+#################################
+# Corpus
+#################################
+
+def fuzz_configs(wide=False):
+    """Catalogue configs the C model can run, up to 64 bits with wide."""
+    configs = OrderedDict(CRC_TABLE.items())
+    if wide:
+        configs.update((name, c) for name, c in CRC_TABLE_WIDE.items() if c.bitwidth <= 64)
+
+    return configs
+
+def fuzz_corpus(configs, cases, max_len=32, seed=0):
+    """Yield (crc_name, flat, offsets) with cases messages spread over configs.
+
+    Lengths are uniform in 0..max_len and one message in eight is all zeros
+    or all ones, which random bytes practically never produce.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    per_config = max(cases // len(configs), 1)
+
+    for crc_name in configs:
+        lengths = rng.integers(0, max_len + 1, per_config)
+        offsets = np.zeros(per_config + 1, dtype=np.uint64)
+        np.cumsum(lengths, out=offsets[1:])
+        flat = rng.integers(0, 0x100, int(offsets[-1]), dtype=np.uint8)
+
+        for i in np.flatnonzero(rng.integers(0, 8, per_config) == 0):
+            flat[offsets[i]:offsets[i+1]] = 0xff * (i & 1)
+
+        yield crc_name, flat, offsets
+
+def corpus_cases(crc_name, flat, offsets, limit=None):
+    data = bytes(flat)
+    count = len(offsets) - 1 if limit is None else min(limit, len(offsets) - 1)
+    return [(crc_name, data[int(offsets[i]):int(offsets[i+1])]) for i in range(count)]
+
+def save_corpus(path, cases):
+    with open(path, "w") as fp:
+        json.dump([[crc_name, message.hex()] for crc_name, message in cases], fp, indent=0)
+
+def load_corpus(path):
+    with open(path) as fp:
+        return [(crc_name, bytes.fromhex(message)) for crc_name, message in json.load(fp)]
+
+#################################
+# Minimization
+#################################
+
+def ddmin_steps(data):
+    """Delta debugging as a generator.
+
+    Yields smaller candidates of the failing input data and expects send()
+    to answer whether each one still fails. Returns the 1-minimal failing
+    input, with every remaining byte then lowered to zero where possible.
+    """
+    data = bytes(data)
+    n = 2
+
+    while len(data) >= 2:
+        chunk = (len(data) + n - 1) // n
+        subsets = [data[i:i+chunk] for i in range(0, len(data), chunk)]
+        complements = [data[:i] + data[i+chunk:] for i in range(0, len(data), chunk)]
+
+        for candidate in subsets + complements:
+            if (yield candidate):
+                data = candidate
+                n = 2 if candidate in subsets else max(n - 1, 2)
+                break
+        else:
+            if n >= len(data):
+                break
+            n = min(n * 2, len(data))
+
+    if len(data) == 1 and (yield b""):
+        return b""
+
+    for i in range(len(data)):
+        if data[i] and (yield data[:i] + b"\0" + data[i+1:]):
+            data = data[:i] + b"\0" + data[i+1:]
+
+    return data
+
+def minimize(data, fails):
+    """Shrink data while fails(data) holds."""
+    steps = ddmin_steps(data)
+    try:
+        candidate = next(steps)
+        while True:
+            candidate = steps.send(fails(candidate))
+    except StopIteration as e:
+        return e.value
+
+#################################
+# Differential runs
+#################################
+
+def implementations(c_model):
+    """Every CRC implementation as name -> fn(crc_name, message)."""
+    return OrderedDict([
+        ("python", golden_crc),
+        ("python-bitwise", golden_crc_bitwise),
+        ("c-bitwise", lambda crc_name, message: c_model.crc(get_config(crc_name), message, bitwise=True)),
+        ("c-bytewise", lambda crc_name, message: c_model.crc(get_config(crc_name), message, bitwise=False)),
+    ])
+
+def disagreement(impls, crc_name, message):
+    results = OrderedDict((name, fn(crc_name, message)) for name, fn in impls.items())
+    return results if len(set(results.values())) > 1 else None
+
+def fuzz(c_model, corpus):
+    """Run the corpus through C and NumPy and return (cases, reproducers).
+
+    Each reproducer is (crc_name, minimized message, results by
+    implementation), at most one per config.
+    """
+    import numpy as np
+
+    impls = implementations(c_model)
+    cases = 0
+    reproducers = []
+
+    for crc_name, flat, offsets in corpus:
+        config = get_config(crc_name)
+        golden = golden_crc_batch(crc_name, flat, offsets)
+        bad = (c_model.crc_batch(config, flat, offsets, bitwise=True) != golden) | \
+                (c_model.crc_batch(config, flat, offsets, bitwise=False) != golden)
+        cases += len(golden)
+
+        if bad.any():
+            i = int(np.flatnonzero(bad)[0])
+            message = minimize(bytes(flat[offsets[i]:offsets[i+1]]),
+                    lambda m: disagreement(impls, crc_name, m) is not None)
+            reproducers.append((crc_name, message, disagreement(impls, crc_name, message)))
+
+    return cases, reproducers
+
+def main():
+    parser = argparse.ArgumentParser(description="Differential fuzzing of the C model against the Python reference")
+    parser.add_argument("--cases", type=int, default=1000000, help="messages in the corpus")
+    parser.add_argument("--max-len", type=int, default=32, help="longest message in bytes")
+    parser.add_argument("--seed", type=int, default=int(time.time()))
+    parser.add_argument("--wide", action="store_true", help="also fuzz catalogue CRCs of 33 to 64 bits")
+    parser.add_argument("--save-corpus", metavar="PATH",
+            help="write reproducers and a sample of the corpus for test_fuzz_corpus")
+    parser.add_argument("--rtl-cases", type=int, default=4, help="corpus messages per config in the saved sample")
+    args = parser.parse_args()
+
+    configs = fuzz_configs(args.wide)
+    c_model = CModel()
+
+    start = time.perf_counter()
+    cases, reproducers = fuzz(c_model, fuzz_corpus(configs, args.cases, args.max_len, args.seed))
+    elapsed = time.perf_counter() - start
+
+    print("seed %d: %d cases over %d configs in %.1fs (%.0f cases/s)" % (args.seed, cases, len(configs),
+        elapsed, cases / elapsed))
+
+    for crc_name, message, results in reproducers:
+        print("%s %r: %s" % (crc_name, message.hex(), ", ".join("%s 0x%x" % r for r in results.items())))
+
+    if args.save_corpus:
+        # only what the decelerator can run
+        sample = [(crc_name, message) for crc_name, message, _ in reproducers if crc_name in CRC_TABLE]
+        for batch in fuzz_corpus(CRC_TABLE, len(CRC_TABLE) * args.rtl_cases, min(args.max_len, 16), args.seed):
+            sample += corpus_cases(*batch, limit=args.rtl_cases)
+
+        save_corpus(args.save_corpus, sample)
+        print("%d cases saved to %s" % (len(sample), args.save_corpus))
+        return 0
+
+    return 1 if reproducers else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
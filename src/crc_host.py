@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# Host side driver for the decelerator.
+#
+# Every CMD_SETUP, CMD_MESSAGE and CMD_FINAL cycle is computed ahead of time
+# as a schedule of (cmd << 4) | data_in bytes, one per clock, and handed to
+# a transport in a single bulk write. Many CRCs can be queued and run back
+# to back in one write, skipping SETUP when the config is already loaded.
+#
+# The transport clocks the schedule onto the pins and returns io_out after
+# each rising edge. LoopbackTransport runs it on the Python model.
+import argparse
+import sys
+from abc import ABC, abstractmethod
+
+from crc_reference import *
+
+class Transport(ABC):
+    """Clocks schedules onto the chip pins."""
+
+    @abstractmethod
+    def reset(self):
+        pass
+
+    @abstractmethod
+    def write(self, schedule):
+        """Drive one schedule byte per clock, return io_out after each edge."""
+
+    def close(self):
+        pass
+
+class LoopbackTransport(Transport):
+    """Runs schedules on the cycle accurate Python model."""
+
+    def __init__(self):
+        from crc_model import CrcDeceleratorModel
+        self.model = CrcDeceleratorModel("crc_host")
+        self.model.reset()
+
+    def reset(self):
+        self.model.reset()
+
+    def write(self, schedule):
+        return self.model.run_schedule(schedule)
+
+class CrcJob:
+    """A queued CRC and where its result bytes land in the io_out trace."""
+
+    def __init__(self, crc_name, message):
+        self.crc_name = crc_name
+        self.message = message
+        self.readback = []
+        self.result = None
+
+class CrcHost:
+    def __init__(self, transport):
+        self.transport = transport
+        # config currently loaded in the chip, SETUP is skipped while it matches
+        self.config = None
+        self.jobs = []
+        self.schedule = bytearray()
+
+    def reset(self):
+        self.transport.reset()
+        self.config = None
+
+    def queue(self, crc_name, message):
+        """Append the waveform for one CRC to the pending schedule."""
+        if isinstance(message, str):
+            message = message.encode()
+
+        config = get_config(crc_name)
+        job = CrcJob(crc_name, message)
+
+        if config != self.config:
+            self.schedule += setup_schedule(config_bitstream(config).nibbles)
+            self.config = config
+        else:
+            self.schedule += bytes([schedule_entry(CRC_CMD.CMD_RESET, 0)] * 2)
+
+        self.schedule += message_schedule(message)
+
+        for b in range((config.bitwidth + 7) // 8):
+            self.schedule += bytes([schedule_entry(CRC_CMD.CMD_FINAL, b)]) * FINAL_BYTE_CYCLES
+            job.readback.append(len(self.schedule) - 1)
+
+        self.jobs.append(job)
+        return job
+
+    def flush(self):
+        """Run everything queued in one bulk write and fill in the results."""
+        jobs, schedule = self.jobs, bytes(self.schedule)
+        self.jobs, self.schedule = [], bytearray()
+
+        if not schedule:
+            return jobs
+
+        io_out = self.transport.write(schedule)
+
+        for job in jobs:
+            job.result = sum(io_out[i] << (8*b) for b, i in enumerate(job.readback))
+
+        return jobs
+
+    def crc(self, crc_name, message):
+        self.queue(crc_name, message)
+        return self.flush()[-1].result
+
+    def crc_many(self, jobs):
+        """CRC of every (crc_name, message) pair, pipelined in one write."""
+        for crc_name, message in jobs:
+            self.queue(crc_name, message)
+
+        return [job.result for job in self.flush()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compute CRCs on the decelerator")
+    parser.add_argument("--crc", default="CRC-32/ISO-HDLC", help="catalogue name of the CRC")
+    parser.add_argument("files", nargs="*", help="files to checksum, the check string if none")
+    args = parser.parse_args()
+
+    host = CrcHost(LoopbackTransport())
+    messages = []
+    for path in args.files:
+        with open(path, "rb") as fp:
+            messages.append((path, fp.read()))
+
+    if not messages:
+        messages = [(repr(CRC_CHECK_STRING), CRC_CHECK_STRING.encode())]
+
+    failures = 0
+    for (name, message), crc in zip(messages, host.crc_many([(args.crc, m) for _, m in messages])):
+        golden = golden_crc(args.crc, message)
+        print("%s %s 0x%x%s" % (args.crc, name, crc, "" if crc == golden else " (expected 0x%x)" % golden))
+        failures += crc != golden
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
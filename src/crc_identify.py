@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# Identify catalogue CRCs from a check value, residue or polynomial with
+# CRC_INDEX, or classify a batch of captured (message, crc) pairs.
+#
+# Classifying probes one unclassified capture at a time. A capture of
+# CRC_CHECK_STRING is a check value lookup in the index, any other capture
+# is run under every catalogue config at once with golden_crc_all. The few
+# configs matching the probe are then run over the whole batch at once with
+# golden_crc_batch, so a capture file of one protocol costs one pass over
+# the probe and one batched CRC per matching config. Captures nothing
+# matches are left for crc_solve.py.
+import argparse
+import sys
+
+from crc_reference import *
+from crc_solve import parse_sample
+
+def candidates(message, crc, bitwidths=None):
+    """Catalogue names that produce crc for message."""
+    if message == CRC_CHECK_STRING.encode():
+        return [name for name in CRC_INDEX.by_check(crc) if bitwidths is None or get_config(name).bitwidth in bitwidths]
+
+    # the same lanes every probe so golden_crc_all reuses its tables
+    names = [name for w in CRC_INDEX.bitwidths() if bitwidths is None or w in bitwidths
+             for name in CRC_INDEX.by_bitwidth(w)]
+
+    return [name for name, value in golden_crc_all(message, names).items() if value == crc]
+
+def batch_matches(crc_name, messages, crcs, flat, offsets, expected, fits):
+    """Indices of the captures whose crc matches crc_name."""
+    if get_config(crc_name).bitwidth > 64:
+        return [i for i, (message, crc) in enumerate(zip(messages, crcs)) if golden_crc(crc_name, message) == crc]
+
+    import numpy as np
+
+    return np.flatnonzero((golden_crc_batch(crc_name, flat, offsets) == expected) & fits).tolist()
+
+def classify(captures, bitwidths=None):
+    """Catalogue names matching each (message, crc) capture.
+
+    Every capture gets all the configs found by any probe that match it, so a
+    capture only lists several names when they really give the same CRC.
+    """
+    import numpy as np
+
+    messages = [bytes(message) for message, crc in captures]
+    crcs = [crc for message, crc in captures]
+    flat = np.frombuffer(b"".join(messages), dtype=np.uint8)
+    offsets = np.cumsum([0] + [len(m) for m in messages])
+    # CRCs too wide for a uint64 never match a batched config
+    expected = np.array([crc & ((1 << 64) - 1) for crc in crcs], dtype=np.uint64)
+    fits = np.array([crc >> 64 == 0 for crc in crcs], dtype=bool)
+
+    matches = [[] for c in captures]
+    tried = set()
+
+    for i, (message, crc) in enumerate(zip(messages, crcs)):
+        if matches[i]:
+            continue
+
+        found = [name for name in candidates(message, crc, bitwidths) if name not in tried]
+
+        for name in found:
+            tried.add(name)
+            for j in batch_matches(name, messages, crcs, flat, offsets, expected, fits):
+                matches[j].append(name)
+
+    return [tuple(names) for names in matches]
+
+def summarize(matches):
+    counts = OrderedDict()
+    for names in matches:
+        if names:
+            counts[names] = counts.get(names, 0) + 1
+
+    for names, count in sorted(counts.items(), key=lambda c: -c[1]):
+        print("%6d  %s" % (count, " = ".join(names)))
+
+    unmatched = sum(1 for names in matches if not names)
+    if unmatched:
+        print("%6d  no catalogue match (try crc_solve.py)" % unmatched)
+
+def print_names(names):
+    for name in names:
+        print("%s  %r" % (name, get_config(name)))
+    return 0 if names else 1
+
+def main():
+    parser = argparse.ArgumentParser(description="Identify catalogue CRCs")
+    parser.add_argument("-w", "--width", type=int, action="append", help="only CRCs of this width (repeatable)")
+    parser.add_argument("--check", type=lambda v: int(v, 16), help="CRC of %s" % CRC_CHECK_STRING)
+    parser.add_argument("--residue", type=lambda v: int(v, 16), help="catalogue residue")
+    parser.add_argument("--poly", type=lambda v: int(v, 16), help="polynomial, needs one --width")
+    parser.add_argument("samples", nargs="*", help="MESSAGE_HEX:CRC_HEX captures to classify")
+    parser.add_argument("-f", "--file", help="file with one MESSAGE_HEX:CRC_HEX capture per line")
+    parser.add_argument("-v", "--verbose", action="store_true", help="print the names matching every capture")
+    args = parser.parse_args()
+
+    width = args.width[0] if args.width and len(args.width) == 1 else None
+
+    if args.check is not None:
+        return print_names(CRC_INDEX.by_check(args.check, width))
+    if args.residue is not None:
+        return print_names(CRC_INDEX.by_residue(args.residue, width))
+    if args.poly is not None:
+        if width is None:
+            parser.error("--poly needs one --width")
+        return print_names(CRC_INDEX.by_poly(width, args.poly))
+
+    captures = [parse_sample(s) for s in args.samples]
+    if args.file:
+        with open(args.file) as fp:
+            captures += [parse_sample(line.strip()) for line in fp if line.strip()]
+
+    if not captures:
+        parser.error("nothing to identify")
+
+    matches = classify(captures, set(args.width) if args.width else None)
+
+    if args.verbose:
+        for (message, crc), names in zip(captures, matches):
+            print("%s:%x  %s" % (message.hex(), crc, " ".join(names) or "-"))
+
+    summarize(matches)
+    return 0 if all(matches) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
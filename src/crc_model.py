@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+# Cycle accurate Python model of granth_crc_decelerator.
+#
+# Mirrors the registers of the top level FSM, crcN and lfsrN one clock edge
+# at a time and exposes them under the same names the cocotb testbenches
+# use (dut.cmd, dut.io_out, dut.crc.setup_fsm, ...). Test coroutines can
+# be run against it in-process with run_model(), without a simulator.
+import logging
+import sys
+import time
+
+from crc_reference import *
+
+# Width of the datapath in granth_crc_decelerator.v (`BITWIDTH)
+MODEL_BITS = 32
+MODEL_MASK = (1 << MODEL_BITS) - 1
+
+# plain ints, enum member lookups dominate the per-cycle cost otherwise
+CMD_RESET, CMD_SETUP, CMD_MESSAGE, CMD_FINAL = [int(v) for v in CRC_CMD]
+CRC_INIT, CRC_DATA_LO, CRC_DATA_HI, CRC_SHIFTING = [int(v) for v in CRC_STATE]
+(SETUP_START, SETUP_CONFIG_LO, SETUP_CONFIG_HI, SETUP_POLY_N, SETUP_INIT_N,
+    SETUP_XOR_N, SETUP_DONE) = [int(v) for v in SETUP_FSM]
+SETUP_NIBBLE_STATES = (SETUP_POLY_N, SETUP_INIT_N, SETUP_XOR_N)
+
+class ModelSignal:
+    """Minimal stand-in for a cocotb handle backed by a model getter."""
+    def __init__(self, get, set=None):
+        self._get = get
+        self._set = set
+
+    @property
+    def value(self):
+        return self._get()
+
+    @value.setter
+    def value(self, v):
+        if self._set is None:
+            raise AttributeError("model signal is read-only")
+        self._set(int(v))
+
+    def __int__(self):
+        return int(self._get())
+
+    def __index__(self):
+        return int(self._get())
+
+    def __eq__(self, other):
+        return int(self._get()) == int(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    # trigger objects are cached per signal
+    __hash__ = object.__hash__
+
+    def __getitem__(self, bit):
+        return ModelSignal(lambda: (int(self._get()) >> bit) & 1)
+
+    def __repr__(self):
+        return "ModelSignal(%r)" % self._get()
+
+class ModelInternals:
+    """Internal registers and wires, accessed as dut.crc.<name>."""
+    def __init__(self, model):
+        m = model
+        for name in ["current_cmd", "cur_data_in", "setup_fsm", "setup_nibble_count", "bitwidth",
+                "crc_reflect_in", "crc_reflect_out", "crc_poly", "crc_init", "crc_xor",
+                "crc_state", "crc_bit_index", "crc_data_buf", "crc_lfsr"]:
+            setattr(self, name, ModelSignal(lambda name=name: getattr(m, "_" + name)))
+
+        self.in_setup = ModelSignal(lambda: int(m.in_setup()))
+        self.crc_result = ModelSignal(m.crc_result)
+        self.io_out = ModelSignal(m.io_out_value)
+
+class CrcDeceleratorModel:
+    """Cycle accurate model of the decelerator top level.
+
+    Inputs are written through dut.rst/dut.cmd/dut.data_in like the cocotb
+    handles and take effect on the next call to step(), which models one
+    rising clock edge with every register updated from the pre-edge state.
+    """
+    _inputs = ("clk", "rst", "cmd", "data_in")
+    _registers = ("_current_cmd", "_cur_data_in", "_setup_fsm", "_setup_nibble_count", "_bitwidth",
+        "_crc_reflect_in", "_crc_reflect_out", "_crc_poly", "_crc_init", "_crc_xor",
+        "_crc_state", "_crc_bit_index", "_crc_data_buf", "_crc_lfsr")
+
+    def __init__(self, name="crc_model"):
+        self._log = logging.getLogger(name)
+        self._rst = 0
+        self._cmd = 0
+        self._data_in = 0
+        self.cycles = 0
+        self._pending = None
+        self._reset_state()
+
+        self.clk = ModelSignal(lambda: 0)
+        self.rst = ModelSignal(lambda: self._rst, self._set_rst)
+        self.cmd = ModelSignal(lambda: self._cmd, self._set_cmd)
+        self.data_in = ModelSignal(lambda: self._data_in, self._set_data_in)
+        self.io_out = ModelSignal(self.io_out_value)
+        self.crc = ModelInternals(self)
+
+    def __setattr__(self, name, value):
+        # allow the deprecated `dut.cmd = x` style writes
+        if name in self._inputs and name in self.__dict__:
+            self.__dict__[name].value = value
+        else:
+            object.__setattr__(self, name, value)
+
+    def _set_rst(self, v):
+        self._rst = v & 1
+
+    def _set_cmd(self, v):
+        self._cmd = v & 0x3
+
+    def _set_data_in(self, v):
+        self._data_in = v & 0xf
+
+    def _reset_state(self):
+        self._current_cmd = CMD_RESET
+        self._cur_data_in = 0
+        self._setup_fsm = SETUP_START
+        self._setup_nibble_count = 0
+        # A conservative default (CRC-32)
+        self._bitwidth = 31
+        self._crc_reflect_in = 0
+        self._crc_reflect_out = 0
+        self._crc_poly = 0
+        self._crc_init = 0
+        self._crc_xor = 0
+        self._crc_state = CRC_INIT
+        self._crc_bit_index = 0
+        self._crc_data_buf = 0
+        self._crc_lfsr = 0
+
+    def reset(self):
+        # same sequence as bringup(): one cycle in reset, one out
+        self._rst = 1
+        self.step()
+        self._rst = 0
+        self.step()
+
+    #################################
+    # Combinational logic
+    #################################
+
+    def setup_starting(self):
+        return self._current_cmd == CMD_SETUP and self._setup_fsm == SETUP_START
+
+    def restart_crc(self):
+        return self._current_cmd == CMD_RESET or self.setup_starting()
+
+    def setup_can_exit(self):
+        return self._setup_fsm == SETUP_DONE and self._cmd != CMD_SETUP
+
+    def in_setup(self):
+        return self._setup_fsm != SETUP_START and not self.setup_can_exit()
+
+    def bitwidth_reached(self):
+        return (self._bitwidth >> 2) == self._setup_nibble_count
+
+    def crc_result(self):
+        bitwidth = self._bitwidth
+        crc = self._crc_lfsr
+
+        if self._crc_reflect_out:
+            crc = reflect(crc, MODEL_BITS) >> (MODEL_BITS - bitwidth - 1)
+
+        return (crc ^ self._crc_xor) & ((1 << (bitwidth + 1)) - 1) & MODEL_MASK
+
+    def io_out_value(self):
+        cmd = self._current_cmd
+
+        if cmd == CMD_SETUP:
+            return (self._setup_fsm << 1) | int(self.in_setup() or self.setup_starting())
+        elif cmd == CMD_MESSAGE:
+            return (self._crc_bit_index << 2) | self._crc_state
+        elif cmd == CMD_FINAL:
+            index = self._cur_data_in & 0x7
+            return (self.crc_result() >> (index * 8)) & 0xff if index < MODEL_BITS // 8 else 0
+
+        return 0
+
+    #################################
+    # Clock edge
+    #################################
+
+    def step(self):
+        """Advance the model by one rising clock edge."""
+        self.cycles += 1
+
+        if self._rst:
+            self._reset_state()
+            return
+
+        # every register is updated from the pre-edge state
+        current_cmd = self._current_cmd
+        cur_data_in = self._cur_data_in
+        setup_fsm = self._setup_fsm
+        nibble_count = self._setup_nibble_count
+        crc_state = self._crc_state
+        crc_bit_index = self._crc_bit_index
+        crc_data_buf = self._crc_data_buf
+        bitwidth = self._bitwidth
+        crc_reflect_in = self._crc_reflect_in
+        crc_poly = self._crc_poly
+        crc_init = self._crc_init
+
+        setup_starting = self.setup_starting()
+        restart_crc = self.restart_crc()
+        setup_can_exit = self.setup_can_exit()
+        in_setup = self.in_setup()
+        bitwidth_reached = self.bitwidth_reached()
+        cmd_message = current_cmd == CMD_MESSAGE
+        crc_shifting = crc_state == CRC_SHIFTING
+        setup_nibbles = setup_fsm in SETUP_NIBBLE_STATES
+
+        # hold CMD_SETUP while processing the config stream
+        if not (current_cmd == CMD_SETUP and in_setup):
+            self._current_cmd = self._cmd
+
+        self._cur_data_in = self._data_in
+
+        #################################
+        # CMD_SETUP registers
+        #################################
+
+        if setup_fsm == SETUP_CONFIG_LO:
+            self._bitwidth = (bitwidth & 0x10) | cur_data_in
+        elif setup_fsm == SETUP_CONFIG_HI:
+            self._bitwidth = ((cur_data_in & 0x4) << 2) | (bitwidth & 0xf)
+            self._crc_reflect_in = cur_data_in & 1
+            self._crc_reflect_out = (cur_data_in >> 1) & 1
+
+        if setup_nibbles and not bitwidth_reached:
+            self._setup_nibble_count = (nibble_count + 1) & 0x7
+        else:
+            self._setup_nibble_count = 0
+
+        if in_setup or setup_starting:
+            if setup_fsm in (SETUP_START, SETUP_CONFIG_LO, SETUP_CONFIG_HI):
+                self._setup_fsm = setup_fsm + 1
+            elif setup_nibbles:
+                if bitwidth_reached:
+                    self._setup_fsm = setup_fsm + 1
+            elif setup_fsm == SETUP_DONE:
+                if setup_can_exit:
+                    self._setup_fsm = SETUP_START
+            else:
+                self._setup_fsm = SETUP_START
+        else:
+            self._setup_fsm = SETUP_START
+
+        if setup_starting:
+            self._crc_poly = self._crc_init = self._crc_xor = 0
+        elif setup_nibbles:
+            shift = nibble_count * 4
+            nibble = cur_data_in << shift
+            keep = ~(0xf << shift) & MODEL_MASK
+
+            if setup_fsm == SETUP_POLY_N:
+                self._crc_poly = (self._crc_poly & keep) | nibble
+            elif setup_fsm == SETUP_INIT_N:
+                self._crc_init = (self._crc_init & keep) | nibble
+            else:
+                self._crc_xor = (self._crc_xor & keep) | nibble
+
+        #################################
+        # CRC datapath
+        #################################
+
+        if restart_crc or not cmd_message:
+            self._crc_state = CRC_INIT
+        elif crc_state == CRC_SHIFTING:
+            if crc_bit_index == 7:
+                self._crc_state = CRC_DATA_LO
+        else:
+            self._crc_state = crc_state + 1
+
+        if restart_crc:
+            self._crc_data_buf = 0
+        elif crc_state == CRC_DATA_LO:
+            self._crc_data_buf = (crc_data_buf & 0xf0) | cur_data_in
+        elif crc_state == CRC_DATA_HI:
+            self._crc_data_buf = (cur_data_in << 4) | (crc_data_buf & 0xf)
+
+        if restart_crc or not cmd_message or not crc_shifting:
+            self._crc_bit_index = 0
+        else:
+            self._crc_bit_index = (crc_bit_index + 1) & 0x7
+
+        # lfsrN: load and shift together hold the value
+        if restart_crc and not crc_shifting:
+            self._crc_lfsr = crc_init
+        elif crc_shifting and not restart_crc:
+            data = crc_data_buf if crc_reflect_in else REFLECT8[crc_data_buf]
+            bit = (data >> crc_bit_index) & 1
+            msb = (self._crc_lfsr >> bitwidth) & 1
+            shifted = (self._crc_lfsr << 1) & MODEL_MASK
+            self._crc_lfsr = shifted ^ crc_poly if msb ^ bit else shifted
+
+    def edge(self):
+        """step(), but keep the old register values visible until commit(),
+        as the simulator does until the edge's non-blocking assignments are
+        applied."""
+        self.commit()
+        state = self.__dict__
+        old = [state[r] for r in self._registers]
+        self.step()
+        self._pending = [state[r] for r in self._registers]
+        state.update(zip(self._registers, old))
+
+    def commit(self):
+        if self._pending is not None:
+            self.__dict__.update(zip(self._registers, self._pending))
+            self._pending = None
+
+    def run_schedule(self, schedule):
+        """Step through a stimulus schedule, returning io_out after each edge."""
+        io_out = bytearray(len(schedule))
+
+        for i, v in enumerate(schedule):
+            self._cmd = v >> 4
+            self._data_in = v & 0xf
+            self.step()
+            io_out[i] = self.io_out_value()
+
+        return bytes(io_out)
+
+def run_model(coro, dut):
+    """Run a test coroutine against the model without a simulator.
+
+    Awaited rising edges (directly or through ClockCycles) advance the model
+    by one clock. Like in the simulator, the coroutine still reads the old
+    register values right after the edge, and the new ones from its next
+    trigger on. Falling edges and timers return immediately.
+    """
+    trigger = None
+
+    while True:
+        try:
+            trigger = coro.send(trigger)
+        except StopIteration as e:
+            dut.commit()
+            return e.value
+
+        kind = type(trigger).__name__
+        if kind in ("RisingEdge", "Edge"):
+            dut.edge()
+        elif kind in ("FallingEdge", "Timer", "ReadOnly", "ReadWrite", "NextTimeStep"):
+            dut.commit()
+        else:
+            raise TypeError("model cannot wait on %r" % (trigger,))
+
+def main():
+    # use the importable module so isinstance checks in the testbench match
+    import crc_decelerator_tb as tb
+    from crc_model import CrcDeceleratorModel, run_model
+
+    logging.basicConfig(level=logging.WARNING)
+    start = time.perf_counter()
+    cycles = 0
+    failures = 0
+
+    tests = [(test.__name__, test, {}) for test in [tb.test_power_up._func, tb.test_CMD_SETUP._func,
+        tb.test_CMD_SETUP_hold._func]]
+    tests += [(name, tb.test_crc_e2e, {"crc_name": name, "reset": False}) for name in tb.sweep_configs()]
+    tests += [(test.__name__, test, {}) for test in [tb.test_crc_resume._func, tb.test_multi_random._func,
+        tb.test_crc_stream._func, tb.test_crc_residue._func,
+        tb.test_coverage_random._func, tb.test_fuzz_corpus._func]]
+
+    for name, test, kwargs in tests:
+        dut = CrcDeceleratorModel()
+        dut.reset()
+
+        try:
+            run_model(test(dut, **kwargs), dut)
+        except AssertionError as e:
+            failures += 1
+            print("FAIL %s: %r" % (name, e))
+
+        cycles += dut.cycles
+
+    elapsed = time.perf_counter() - start
+    print("%d tests, %d failures, %d cycles in %.2fs (%.0f cycles/s)" % (len(tests), failures,
+        cycles, elapsed, cycles / elapsed))
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+# Per-phase profiler for the testbenches.
+#
+# Phases wrap the awaits of a test, either as a decorator on a coroutine
+# (@profiled("bringup")) or as a block:
+#
+#   with profile_phase(dut, "message"):
+#       await stream_in_message(dut, data)
+#
+# and record simulated cycles, simulator time, host wall time and the net
+# number of Python memory blocks allocated. Phases nest under the name of
+# the running test. Phases of coroutines running concurrently would be
+# nested into each other, so only profile one driver at a time.
+#
+# Off unless CRC_PROFILE=yes. The report is written next to results.xml
+# when the simulator exits:
+#   profile_cycles.folded, profile_wall.folded   flamegraph.pl/speedscope input
+#   profile_summary.txt                           totals per phase
+import atexit
+import functools
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+
+PROFILE_ENABLED = os.environ.get("CRC_PROFILE", "no") == "yes"
+
+# keep in sync with the Clock started by bringup()
+CLOCK_PERIOD_NS = 10
+
+# per phase: calls, cycles, sim time (ns), wall time (s), net allocated blocks
+CALLS, CYCLES, SIM_NS, WALL_S, BLOCKS = range(5)
+
+def current_test():
+    import cocotb
+    manager = getattr(cocotb, "regression_manager", None)
+    test = getattr(manager, "_test", None)
+    return test.__qualname__ if test is not None else "main"
+
+def sim_time_ns(dut):
+    # the Python model counts its own clocks
+    if hasattr(dut, "cycles"):
+        return dut.cycles * CLOCK_PERIOD_NS
+
+    from cocotb.utils import get_sim_time
+    return int(get_sim_time("ns"))
+
+class Profiler:
+    def __init__(self):
+        self.stack = []
+        # stack of phase names -> totals, including nested phases
+        self.stats = {}
+
+    def _add(self, path, sim_ns, wall_s, blocks, calls=1):
+        stats = self.stats.setdefault(path, [0, 0, 0, 0.0, 0])
+        stats[CALLS] += calls
+        stats[CYCLES] += sim_ns // CLOCK_PERIOD_NS
+        stats[SIM_NS] += sim_ns
+        stats[WALL_S] += wall_s
+        stats[BLOCKS] += blocks
+
+    @contextmanager
+    def phase(self, dut, name):
+        if not self.stack:
+            self.stack.append(current_test())
+        self.stack.append(name)
+        path = tuple(self.stack)
+
+        start_ns, start_wall, start_blocks = sim_time_ns(dut), time.perf_counter(), sys.getallocatedblocks()
+        try:
+            yield
+        finally:
+            self._add(path, sim_time_ns(dut) - start_ns, time.perf_counter() - start_wall,
+                    sys.getallocatedblocks() - start_blocks)
+            self.stack.pop()
+            if len(self.stack) == 1:
+                self.stack.pop()
+
+    def split(self, name, cycles):
+        """Attribute cycles of the current phase to a child without wall time,
+        e.g. the shift cycles of a message."""
+        if self.stack:
+            self._add(tuple(self.stack) + (name,), cycles * CLOCK_PERIOD_NS, 0.0, 0)
+
+    def self_stats(self, path, metric):
+        # folded stacks want the part of a phase not spent in its children
+        children = sum(stats[metric] for child, stats in self.stats.items()
+                if len(child) == len(path) + 1 and child[:len(path)] == path)
+        return self.stats[path][metric] - children
+
+    def folded(self, metric, scale=1):
+        lines = []
+        for path in sorted(self.stats):
+            value = int(round(self.self_stats(path, metric) * scale))
+            if value > 0:
+                lines.append("%s %d" % (";".join(path), value))
+
+        return lines
+
+    def summary(self):
+        # totals per phase name, whatever test it ran in
+        phases = {}
+        for path, stats in self.stats.items():
+            totals = phases.setdefault(path[-1], [0, 0, 0, 0.0, 0])
+            for i, v in enumerate(stats):
+                totals[i] += v
+
+        total_cycles = sum(stats[CYCLES] for path, stats in self.stats.items() if len(path) == 2) or 1
+        lines = ["%-16s %8s %10s %6s %12s %10s %10s" % ("phase", "calls", "cycles", "%", "sim ns", "wall ms", "blocks")]
+        for name, stats in sorted(phases.items(), key=lambda p: -p[1][CYCLES]):
+            lines.append("%-16s %8d %10d %6.1f %12d %10.1f %10d" % (name, stats[CALLS], stats[CYCLES],
+                100.0 * stats[CYCLES] / total_cycles, stats[SIM_NS], stats[WALL_S] * 1e3, stats[BLOCKS]))
+
+        return lines
+
+    def write(self, directory):
+        if not self.stats:
+            return
+
+        reports = [
+            ("profile_cycles.folded", self.folded(CYCLES)),
+            ("profile_wall.folded", self.folded(WALL_S, 1e6)),
+            ("profile_summary.txt", self.summary()),
+        ]
+        for name, lines in reports:
+            with open(os.path.join(directory, name), "w") as fp:
+                fp.write("\n".join(lines) + "\n")
+
+_profiler = None
+
+def profiler():
+    global _profiler
+
+    if _profiler is None:
+        _profiler = Profiler()
+        results = os.environ.get("COCOTB_RESULTS_FILE", "results.xml")
+        atexit.register(_profiler.write, os.path.dirname(os.path.abspath(results)))
+
+    return _profiler
+
+def profile_phase(dut, name):
+    if not PROFILE_ENABLED:
+        return nullcontext()
+
+    return profiler().phase(dut, name)
+
+def profile_split(name, cycles):
+    if PROFILE_ENABLED:
+        profiler().split(name, cycles)
+
+def profiled(name):
+    """Decorator timing a coroutine function taking dut first as a phase."""
+    def decorator(fn):
+        if not PROFILE_ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        async def wrapper(dut, *args, **kwargs):
+            with profiler().phase(dut, name):
+                return await fn(dut, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
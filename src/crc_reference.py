@@ -0,0 +1,706 @@
+# Pure Python CRC reference models shared by the testbenches and tools.
+#
+# Nothing here imports cocotb (or NumPy, until a batched function is
+# called) so it stays cheap to import in every simulator process.
+import os
+import threading
+from enum import IntEnum
+from struct import pack, unpack, calcsize
+from collections import namedtuple, OrderedDict
+from collections.abc import Mapping
+from functools import lru_cache
+from types import MappingProxyType
+
+CC = namedtuple("CrcConfig", "bitwidth check poly init reflect_in reflect_out xorout")
+
+CRC_CHECK_STRING = "123456789"
+MAX_BITS = 32
+
+# Compiled from crc_catalogue.txt by ./create_crc_tables.py, loaded on first use
+CATALOGUE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crc_catalogue.json")
+TABLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crc_tables.bin")
+
+@lru_cache(maxsize=None)
+def load_catalogue(path):
+    """Ordered name -> (CC, residue) dict of a compiled catalogue."""
+    import json
+
+    with open(path) as fp:
+        entries = json.load(fp)
+
+    return OrderedDict((name, (CC(bitwidth, int(check, 16), int(poly, 16), int(init, 16),
+        reflect_in, reflect_out, int(xorout, 16)), int(residue, 16)))
+        for name, bitwidth, check, poly, init, reflect_in, reflect_out, xorout, residue in entries)
+
+class CrcCatalogue(Mapping):
+    """Read-only name -> CC view of the catalogue for a range of bitwidths."""
+
+    def __init__(self, path, min_bits=1, max_bits=None):
+        self.path = path
+        self.min_bits = min_bits
+        self.max_bits = max_bits
+        self._table = None
+
+    def _load(self):
+        if self._table is None:
+            self._table = OrderedDict((name, config) for name, (config, residue) in load_catalogue(self.path).items()
+                if config.bitwidth >= self.min_bits and (self.max_bits is None or config.bitwidth <= self.max_bits))
+
+        return self._table
+
+    def residue(self, name):
+        """The residue listed in the catalogue for name."""
+        self[name]
+        return load_catalogue(self.path)[name][1]
+
+    def __getitem__(self, name):
+        return self._load()[name]
+
+    def __contains__(self, name):
+        return name in self._load()
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        return "CrcCatalogue(%r, %d, %r)" % (self.path, self.min_bits, self.max_bits)
+
+# Configs the design supports, and the wider ones only the models handle
+CRC_TABLE = CrcCatalogue(CATALOGUE_FILE, max_bits=MAX_BITS)
+CRC_TABLE_WIDE = CrcCatalogue(CATALOGUE_FILE, min_bits=MAX_BITS+1)
+
+class CrcIndex:
+    """Catalogue names by check, residue, (bitwidth, poly) and config."""
+
+    def __init__(self, path):
+        self.path = path
+        self._keys = None
+
+    def _load(self):
+        if self._keys is None:
+            keys = {"check": {}, "residue": {}, "poly": {}, "bitwidth": {}, "config": {}}
+            for name, (config, residue) in load_catalogue(self.path).items():
+                keys["check"].setdefault(config.check, []).append(name)
+                keys["residue"].setdefault(residue, []).append(name)
+                keys["poly"].setdefault((config.bitwidth, config.poly), []).append(name)
+                keys["bitwidth"].setdefault(config.bitwidth, []).append(name)
+                keys["config"].setdefault(config, []).append(name)
+
+            self._keys = {kind: {key: tuple(names) for key, names in index.items()} for kind, index in keys.items()}
+
+        return self._keys
+
+    def _lookup(self, kind, key, bitwidth=None):
+        names = self._load()[kind].get(key, ())
+        if bitwidth is None:
+            return names
+        return tuple(name for name in names if load_catalogue(self.path)[name][0].bitwidth == bitwidth)
+
+    def by_check(self, check, bitwidth=None):
+        """CRCs of CRC_CHECK_STRING equal to check."""
+        return self._lookup("check", check, bitwidth)
+
+    def by_residue(self, residue, bitwidth=None):
+        """CRCs with this catalogue residue (see crc_residue)."""
+        return self._lookup("residue", residue, bitwidth)
+
+    def by_poly(self, bitwidth, poly):
+        return self._lookup("poly", (bitwidth, poly))
+
+    def by_bitwidth(self, bitwidth):
+        return self._lookup("bitwidth", bitwidth)
+
+    def by_config(self, config):
+        """The catalogue name of config, None if it is not listed."""
+        names = self._lookup("config", config)
+        return names[0] if names else None
+
+    def bitwidths(self):
+        return sorted(self._load()["bitwidth"])
+
+CRC_INDEX = CrcIndex(CATALOGUE_FILE)
+
+# Used for easier visual inspection. Bogus check word
+CRC_TABLE_FAKE = OrderedDict({
+    # Name, bitwidth, check,    poly,   init,   reflect_in, reflect_out, xorout
+    "FAKE4": CC(4,	0x00,	0xa,	0xb,	True,	False,	0xc),
+    "FAKE8": CC(8,	0x00,	0xab,	0xcd,	True,	True,	0xef),
+    "FAKE16": CC(16,	0x00,	0xabcd,	0xdead,	False,	True,	0xcafe),
+    "FAKE32": CC(32,	0x00,	0xabcdef1,	0xcafeca1e,	False,	True,	0xdeadbeef),
+    "FAKE60": CC(60,	0x00,	0x123456780abcdef,	0x123456780abcdef,	False,	True,	0x123456780abcdef),
+})
+
+# Maximum number of CRC configurations to keep lookup tables for
+CRC_LOOKUP_CACHE_SIZE = 256
+
+def get_config(name):
+    if name in CRC_TABLE:
+        return CRC_TABLE[name]
+    elif name in CRC_TABLE_WIDE:
+        return CRC_TABLE_WIDE[name]
+    else:
+        return CRC_TABLE_FAKE[name]
+
+def reflect_bitwise(v, bitwidth):
+    nv = 0
+    for i in range(bitwidth):
+        if v & (1 << i):
+            nv |= 1 << (bitwidth - i - 1)
+
+    return nv
+
+# every byte value with its bits reversed
+REFLECT8 = tuple(reflect_bitwise(v, 8) for v in range(0x100))
+
+def reflect(v, bitwidth):
+    # reflect whole bytes through REFLECT8, then drop the padding bits
+    nbytes = (bitwidth + 7) // 8
+    nv = 0
+    for i in range(nbytes):
+        nv = (nv << 8) | REFLECT8[(v >> (8*i)) & 0xff]
+
+    return nv >> (8*nbytes - bitwidth)
+
+def reflect_array(values, bitwidth):
+    """Vectorized reflect() of an array of up to 64-bit values with NumPy."""
+    import numpy as np
+
+    assert bitwidth <= 64
+    values = np.asarray(values, dtype=np.uint64)
+    table = np.array(REFLECT8, dtype=np.uint64)
+    nbytes = (bitwidth + 7) // 8
+    reflected = np.zeros_like(values)
+
+    for i in range(nbytes):
+        reflected = (reflected << np.uint64(8)) | table[(values >> np.uint64(8*i)) & np.uint64(0xff)]
+
+    return reflected >> np.uint64(8*nbytes - bitwidth)
+
+# crc_tables.bin: header, then per config its fields and 256 table entries
+TABLES_MAGIC = b"CRCT"
+TABLES_HEADER = "<4sII"
+TABLES_CONFIG = "<BQQQ??Q"
+
+@lru_cache(maxsize=None)
+def precomputed_tables(path=TABLES_FILE):
+    """Tables from create_crc_tables.py --tables, keyed by config."""
+    from array import array
+
+    if not os.path.exists(path):
+        return {}
+
+    with open(path, "rb") as fp:
+        data = fp.read()
+
+    magic, version, count = unpack(TABLES_HEADER, data[:calcsize(TABLES_HEADER)])
+    if magic != TABLES_MAGIC or version != 1:
+        return {}
+
+    tables = {}
+    offset = calcsize(TABLES_HEADER)
+    for i in range(count):
+        bitwidth, check, poly, init, reflect_in, reflect_out, xorout = unpack(TABLES_CONFIG,
+            data[offset:offset+calcsize(TABLES_CONFIG)])
+        offset += calcsize(TABLES_CONFIG)
+
+        table = array("Q")
+        table.frombytes(data[offset:offset+256*8])
+        offset += 256*8
+
+        tables[CC(bitwidth, check, poly, init, reflect_in, reflect_out, xorout)] = tuple(table)
+
+    return tables
+
+def write_precomputed_tables(path, configs):
+    """Write the tables of configs up to 64 bits for precomputed_tables()."""
+    configs = [config for config in configs if config.bitwidth <= 64]
+
+    with open(path, "wb") as fp:
+        fp.write(pack(TABLES_HEADER, TABLES_MAGIC, 1, len(configs)))
+        for config in configs:
+            fp.write(pack(TABLES_CONFIG, *config))
+            fp.write(pack("<256Q", *crc_lookup_tables(config)[0]))
+
+@lru_cache(maxsize=CRC_LOOKUP_CACHE_SIZE)
+def crc_lookup_tables(config, slices=1):
+    """`slices` 256-entry lookup tables for a config, reflected for reflect_in."""
+    if slices == 1 and config in precomputed_tables():
+        return (precomputed_tables()[config],)
+
+    if config.reflect_in:
+        poly = reflect(config.poly, config.bitwidth)
+        table = []
+
+        for i in range(0x100):
+            crc = i
+            for b in range(8):
+                crc = (crc >> 1) ^ poly if crc & 1 else crc >> 1
+            table.append(crc)
+
+        tables = [table]
+        for n in range(1, slices):
+            tables.append([(crc >> 8) ^ table[crc & 0xff] for crc in tables[-1]])
+    else:
+        width = max(config.bitwidth, 8*slices)
+        poly = config.poly << (width - config.bitwidth)
+        topbit = 1 << (width - 1)
+        bitmask = (1 << width) - 1
+        table = []
+
+        for i in range(0x100):
+            crc = i << (width - 8)
+            for b in range(8):
+                crc = ((crc << 1) ^ poly) & bitmask if crc & topbit else (crc << 1) & bitmask
+            table.append(crc)
+
+        tables = [table]
+        for n in range(1, slices):
+            tables.append([((crc << 8) & bitmask) ^ table[crc >> (width - 8)] for crc in tables[-1]])
+
+    return tuple(tuple(t) for t in tables)
+
+def crc_init_state(config):
+    # register state is kept reflected for reflect_in CRCs
+    return reflect(config.init, config.bitwidth) if config.reflect_in else config.init
+
+def crc_update(config, crc, data, slices=1):
+    """Feed bytes into a register state, slice-by-`slices`."""
+    if not isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data)
+
+    tables = crc_lookup_tables(config, slices)
+    table = tables[0]
+    # byte-wise tail after the sliced portion
+    sliced = len(data) - len(data) % slices if slices > 1 else 0
+    tail = data[sliced:] if sliced else data
+    rtables = list(enumerate(reversed(tables)))
+
+    if config.reflect_in:
+        for i in range(0, sliced, slices):
+            crc ^= int.from_bytes(data[i:i+slices], "little")
+            res = crc >> (8*slices)
+            for k, t in rtables:
+                res ^= t[(crc >> (8*k)) & 0xff]
+            crc = res
+
+        for c in tail:
+            crc = table[(crc ^ c) & 0xff] ^ (crc >> 8)
+    else:
+        width = max(config.bitwidth, 8*slices)
+        shift = width - config.bitwidth
+        bitmask = (1 << width) - 1
+        crc <<= shift
+
+        for i in range(0, sliced, slices):
+            crc ^= int.from_bytes(data[i:i+slices], "big") << (width - 8*slices)
+            res = (crc << (8*slices)) & bitmask
+            for k, t in rtables:
+                res ^= t[(crc >> (width - 8 - 8*k)) & 0xff]
+            crc = res
+
+        top = width - 8
+        for c in tail:
+            crc = ((crc << 8) & bitmask) ^ table[(crc >> top) ^ c]
+
+        crc >>= shift
+
+    return crc
+
+def crc_finalize(config, crc):
+    # the register is already reflected when reflect_in is set
+    crc = reflect(crc, config.bitwidth) if config.reflect_in != config.reflect_out else crc
+    return (crc ^ config.xorout) & ((1 << config.bitwidth) - 1)
+
+def gf2_matrix_times(mat, vec):
+    # mat is a list of columns, one per bit of vec
+    res = 0
+    i = 0
+    while vec:
+        if vec & 1:
+            res ^= mat[i]
+        vec >>= 1
+        i += 1
+
+    return res
+
+def gf2_matrix_square(mat):
+    return [gf2_matrix_times(mat, col) for col in mat]
+
+# config -> tuple of zero byte operators, only ever replaced by a longer tuple
+_ZEROS_OPERATORS = OrderedDict()
+_ZEROS_OPERATORS_LOCK = threading.Lock()
+
+def crc_zeros_operators(config, count=1):
+    """At least count GF(2) matrices, entry k feeding 2**k zero bytes."""
+    with _ZEROS_OPERATORS_LOCK:
+        operators = _ZEROS_OPERATORS.get(config)
+
+        if operators is None:
+            if config.reflect_in:
+                poly = reflect(config.poly, config.bitwidth)
+                zero_bit = [(1 << i) >> 1 for i in range(config.bitwidth)]
+                zero_bit[0] ^= poly
+            else:
+                zero_bit = [1 << (i + 1) for i in range(config.bitwidth)]
+                zero_bit[-1] = config.poly
+
+            zero_byte = zero_bit
+            for i in range(3):
+                zero_byte = gf2_matrix_square(zero_byte)
+
+            operators = (zero_byte,)
+
+        while len(operators) < count:
+            operators += (gf2_matrix_square(operators[-1]),)
+
+        _ZEROS_OPERATORS[config] = operators
+        _ZEROS_OPERATORS.move_to_end(config)
+        if len(_ZEROS_OPERATORS) > CRC_LOOKUP_CACHE_SIZE:
+            _ZEROS_OPERATORS.popitem(last=False)
+
+    return operators
+
+def crc_shift_zeros(config, crc, n):
+    # advance a register state over n zero bytes in O(log n) matrix products
+    operators = crc_zeros_operators(config, n.bit_length())
+    k = 0
+
+    while n:
+        if n & 1:
+            crc = gf2_matrix_times(operators[k], crc)
+
+        n >>= 1
+        k += 1
+
+    return crc
+
+def crc_unfinalize(config, crc):
+    # inverse of crc_finalize, recovers the register state from a CRC
+    crc ^= config.xorout
+    return reflect(crc, config.bitwidth) if config.reflect_in != config.reflect_out else crc
+
+def crc_extend_zeros(config, crc, n):
+    """CRC of a message extended by n zero bytes, given the message CRC."""
+    return crc_finalize(config, crc_shift_zeros(config, crc_unfinalize(config, crc), n))
+
+def crc_combine(config, crc_a, crc_b, len_b):
+    """CRC of message A followed by message B from their individual CRCs."""
+    crc = crc_unfinalize(config, crc_a) ^ crc_init_state(config)
+    crc = crc_shift_zeros(config, crc, len_b) ^ crc_unfinalize(config, crc_b)
+
+    return crc_finalize(config, crc)
+
+def crc_residue(config):
+    """Register after an error-free codeword, as listed in the catalogue."""
+    bitwidth = config.bitwidth
+    xorout = reflect(config.xorout, bitwidth) if config.reflect_out else config.xorout
+
+    # xorout * x^bitwidth mod poly
+    residue = xorout
+    for i in range(bitwidth):
+        residue <<= 1
+        if residue >> bitwidth:
+            residue ^= (1 << bitwidth) | config.poly
+
+    return reflect(residue, bitwidth) if config.reflect_out else residue
+
+def crc_append_bytes(config, crc):
+    """Bytes appending crc to a message to make an error-free codeword."""
+    nbytes = (config.bitwidth + 7) // 8
+    if config.reflect_in != config.reflect_out:
+        crc = reflect(crc, config.bitwidth)
+
+    if config.reflect_in:
+        return crc.to_bytes(nbytes, "little")
+    return (crc << (8*nbytes - config.bitwidth)).to_bytes(nbytes, "big")
+
+@lru_cache(maxsize=CRC_LOOKUP_CACHE_SIZE)
+def crc_residue_readback(config):
+    """CRC read back after any message followed by its appended CRC."""
+    message = CRC_CHECK_STRING.encode()
+    crc = crc_finalize(config, crc_update(config, crc_init_state(config), message))
+    codeword = message + crc_append_bytes(config, crc)
+
+    return crc_finalize(config, crc_update(config, crc_init_state(config), codeword))
+
+def crc_chain_codewords(config, messages):
+    """Messages each followed by its CRC, chained through the register."""
+    crc = crc_init_state(config)
+    chain = bytearray()
+
+    for message in messages:
+        crc = crc_update(config, crc, message)
+        append = crc_append_bytes(config, crc_finalize(config, crc))
+        crc = crc_update(config, crc, append)
+        chain += message
+        chain += append
+
+    return bytes(chain)
+
+def golden_crc(crc_name, inp):
+    config = get_config(crc_name)
+    return crc_finalize(config, crc_update(config, crc_init_state(config), inp))
+
+def golden_crc_batch(crc_name, messages, offsets=None):
+    """Golden CRCs of a 2-D array, list or flat buffer + offsets of messages."""
+    import numpy as np
+
+    config = get_config(crc_name)
+    assert config.bitwidth <= 64
+
+    if offsets is None and isinstance(messages, np.ndarray) and messages.ndim == 2:
+        data = messages.astype(np.uint8, copy=False)
+        lengths = np.full(data.shape[0], data.shape[1], dtype=np.int64)
+    else:
+        if offsets is None:
+            messages = [bytes(m) for m in messages]
+            offsets = np.cumsum([0] + [len(m) for m in messages])
+            flat = np.frombuffer(b"".join(messages), dtype=np.uint8)
+        else:
+            flat = np.asarray(messages, dtype=np.uint8).ravel()
+
+        offsets = np.asarray(offsets, dtype=np.int64)
+        lengths = np.diff(offsets)
+        columns = np.arange(lengths.max(initial=0))
+        index = np.minimum(offsets[:-1, None] + columns[None, :], max(len(flat) - 1, 0))
+        data = flat[index] if len(flat) else np.zeros(index.shape, dtype=np.uint8)
+
+    # longest messages first so the rows still being fed are always a prefix
+    order = np.argsort(-lengths, kind="stable")
+    data = data[order]
+    active = np.searchsorted(-lengths[order], -np.arange(data.shape[1]), side="left")
+
+    table = np.array(crc_lookup_tables(config)[0], dtype=np.uint64)
+    crc = np.full(len(lengths), crc_init_state(config), dtype=np.uint64)
+    byte_mask = np.uint64(0xff)
+    eight = np.uint64(8)
+
+    if config.reflect_in:
+        for i in range(data.shape[1]):
+            n = active[i]
+            c = crc[:n]
+            crc[:n] = table[(c ^ data[:n, i]) & byte_mask] ^ (c >> eight)
+    else:
+        width = max(config.bitwidth, 8)
+        shift = np.uint64(width - config.bitwidth)
+        top = np.uint64(width - 8)
+        bitmask = np.uint64((1 << width) - 1)
+        crc <<= shift
+
+        for i in range(data.shape[1]):
+            n = active[i]
+            c = crc[:n]
+            crc[:n] = ((c << eight) & bitmask) ^ table[(c >> top) ^ data[:n, i]]
+
+        crc >>= shift
+
+    if config.reflect_in != config.reflect_out:
+        crc = reflect_array(crc, config.bitwidth)
+
+    crc ^= np.uint64(config.xorout)
+    crc &= np.uint64((1 << config.bitwidth) - 1)
+
+    result = np.empty_like(crc)
+    result[order] = crc
+
+    return result
+
+@lru_cache(maxsize=16)
+def _lane_tables(names):
+    """Per lane tables for golden_crc_all, left aligned in 64 bits."""
+    import numpy as np
+
+    configs = [get_config(name) for name in names]
+    shift = np.array([64 - c.bitwidth for c in configs], dtype=np.uint64)
+    poly = np.array([c.poly for c in configs], dtype=np.uint64) << shift
+
+    # table[lane, b] for a message byte b already reflected if reflect_in
+    table = np.arange(256, dtype=np.uint64)[None, :] << np.uint64(56)
+    table = np.repeat(table, len(configs), axis=0)
+    for i in range(8):
+        top = table >> np.uint64(63)
+        table = (table << np.uint64(1)) ^ (poly[:, None] * top)
+
+    # row c of keys is each lane's table offset XOR the byte it sees for c,
+    # so a lookup is table[(reg >> 56) ^ keys[c]]
+    reflected = np.array([REFLECT8[b] for b in range(256)], dtype=np.uint64)
+    lane_bytes = np.where(np.array([c.reflect_in for c in configs])[None, :],
+        reflected[:, None], np.arange(256, dtype=np.uint64)[:, None])
+    keys = lane_bytes ^ (np.arange(len(configs), dtype=np.uint64) << np.uint64(8))[None, :]
+
+    init = np.array([c.init for c in configs], dtype=np.uint64) << shift
+
+    return table.ravel(), keys, init, shift
+
+def golden_crc_all(message, names=None):
+    """Ordered name -> golden CRC of one message under many configs."""
+    import numpy as np
+
+    names = tuple(CRC_TABLE.keys()) if names is None else tuple(names)
+    lanes = tuple(name for name in names if get_config(name).bitwidth <= 64)
+    results = {}
+
+    if lanes:
+        table, keys, init, shift = _lane_tables(lanes)
+        reg = init.copy()
+        idx = np.empty_like(reg)
+        top, eight = np.uint64(56), np.uint64(8)
+
+        for c in bytes(message):
+            np.right_shift(reg, top, out=idx)
+            idx ^= keys[c]
+            reg <<= eight
+            reg ^= table[idx]
+
+        reg >>= shift
+        for name, crc in zip(lanes, reg.tolist()):
+            config = get_config(name)
+            crc = reflect(crc, config.bitwidth) if config.reflect_out else crc
+            results[name] = crc ^ config.xorout
+
+    return OrderedDict((name, results[name] if name in results else golden_crc(name, message)) for name in names)
+
+def golden_crc_bitwise(crc_name, inp):
+    config = get_config(crc_name)
+
+    bitmask = (1 << config.bitwidth) - 1
+    crc = config.init
+
+    for c in inp:
+        b, direction = (0, 1) if config.reflect_in else (7, -1)
+
+        for i in range(8):
+            ib = int(bool(c & (1 << b)))
+            msb = bool((crc >> (config.bitwidth - 1)) ^ ib)
+            crc_shifted = ((crc << 1) & bitmask)
+            crc = crc_shifted ^ config.poly if msb else crc_shifted
+            b += direction
+
+    crc = reflect_bitwise(crc, config.bitwidth) if config.reflect_out else crc
+
+    return (crc ^ config.xorout) & bitmask
+
+def pack_nibbles(*nibbles):
+    out = b""
+    buf = 0
+
+    for i, n in enumerate(nibbles):
+        assert n >= 0 and n <= 15
+
+        which = i % 2
+        buf |= n << (which*4)
+
+        # full byte or end of stream
+        if (i+1) % 2 == 0 or (i+1) == len(nibbles):
+            out += pack("<B", buf)
+            buf = 0
+
+    return out
+
+def pack_to_nibbles(value, bitwidth):
+    nibbles = []
+    #assert bitwidth % 4 == 0
+
+    for n in range(0, bitwidth, 4):
+        nibbles.append(value & 0xf)
+        value >>= 4
+
+    return nibbles
+
+def config_nibbles(config):
+    """The CMD_SETUP bitstream for a config, one nibble per cycle."""
+    assert config.bitwidth <= MAX_BITS
+    bitwidth_minus = config.bitwidth - 1
+
+    config_lo = pack_to_nibbles(bitwidth_minus, 4)
+    config_hi = pack_to_nibbles((((bitwidth_minus >> 4) & 0x3) << 2) | (config.reflect_out << 1) | config.reflect_in, 4)
+    poly = pack_to_nibbles(config.poly, config.bitwidth)
+    init = pack_to_nibbles(config.init, config.bitwidth)
+    xor = pack_to_nibbles(config.xorout, config.bitwidth)
+
+    return config_lo + config_hi + poly + init + xor
+
+def setup_config(nibbles):
+    """The config a CMD_SETUP nibble stream loads, inverse of config_nibbles."""
+    bitwidth = (nibbles[0] | ((nibbles[1] >> 2) & 0x3) << 4) + 1
+    count = (len(nibbles) - 2) // 3
+    values = [sum(n << (4 * i) for i, n in enumerate(nibbles[2 + g * count:2 + (g + 1) * count])) for g in range(3)]
+
+    return CC(bitwidth, 0, values[0], values[1], bool(nibbles[1] & 1), bool(nibbles[1] & 2), values[2])
+
+ConfigBitstream = namedtuple("ConfigBitstream", "nibbles packed cycles")
+
+@lru_cache(maxsize=CRC_LOOKUP_CACHE_SIZE)
+def config_bitstream(config):
+    """Memoized CMD_SETUP nibbles, packed bytes and cycles."""
+    nibbles = tuple(config_nibbles(config))
+    return ConfigBitstream(nibbles, pack_nibbles(*nibbles), len(nibbles) + 2)
+
+@lru_cache(maxsize=None)
+def config_bitstream_table():
+    """Bitstreams for every catalogue and fake config that fits the datapath."""
+    return MappingProxyType({name: config_bitstream(config)
+        for table in (CRC_TABLE, CRC_TABLE_FAKE) for name, config in table.items()
+        if config.bitwidth <= MAX_BITS})
+
+class CRC_CMD(IntEnum):
+    CMD_RESET = 0
+    CMD_SETUP = 1
+    CMD_MESSAGE = 2
+    CMD_FINAL = 3
+
+class CRC_STATE(IntEnum):
+    CRC_INIT = 0
+    CRC_DATA_LO = 1
+    CRC_DATA_HI = 2
+    CRC_SHIFTING = 3
+
+class SETUP_FSM(IntEnum):
+    SETUP_START = 0
+    SETUP_CONFIG_LO = 1
+    SETUP_CONFIG_HI = 2
+    SETUP_POLY_N = 3
+    SETUP_INIT_N = 4
+    SETUP_XOR_N = 5
+    SETUP_DONE = 6
+
+# Stimulus schedules hold one (cmd << 4) | data_in byte per clock cycle
+def schedule_entry(cmd, data_in):
+    return (cmd << 4) | data_in
+
+# Cycles a byte occupies in CMD_MESSAGE: two nibbles then 8 shifting cycles
+MESSAGE_BYTE_CYCLES = 10
+
+def _message_byte_schedule(c):
+    lo, hi = pack_to_nibbles(c, 8)
+    return bytes([schedule_entry(CRC_CMD.CMD_MESSAGE, lo)] +
+            [schedule_entry(CRC_CMD.CMD_MESSAGE, hi)] * (MESSAGE_BYTE_CYCLES - 1))
+
+MESSAGE_BYTE_SCHEDULE = [_message_byte_schedule(c) for c in range(0x100)]
+
+def message_schedule(data, start=True):
+    """Per-cycle stimulus streaming a message."""
+    body = b"".join([MESSAGE_BYTE_SCHEDULE[c] for c in data])
+    if not start:
+        return body
+
+    first = data[0] & 0xf if len(data) else 0
+    return bytes([schedule_entry(CRC_CMD.CMD_MESSAGE, first)]) + body
+
+def setup_schedule(nibbles):
+    """Per-cycle stimulus for CMD_SETUP followed by CMD_RESET."""
+    return bytes([schedule_entry(CRC_CMD.CMD_SETUP, 0)] +
+            [schedule_entry(CRC_CMD.CMD_SETUP, n) for n in nibbles] +
+            [schedule_entry(CRC_CMD.CMD_SETUP, nibbles[-1])] +
+            [schedule_entry(CRC_CMD.CMD_RESET, 0)] * 2)
+
+# Cycles each result byte is held in CMD_FINAL before io_out is valid
+FINAL_BYTE_CYCLES = 2
+
+def final_schedule(bitwidth):
+    """Per-cycle stimulus reading back a result with CMD_FINAL."""
+    return b"".join([bytes([schedule_entry(CRC_CMD.CMD_FINAL, b)]) * FINAL_BYTE_CYCLES
+            for b in range((bitwidth + 7) // 8)])
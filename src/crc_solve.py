@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+# Recover CRC parameters from (message, crc) samples with GF(2) algebra.
+#
+# For each reflect_in/reflect_out combination, with the CRC unreflected and
+# the message bytes reflected as the engine would, a CRC is
+#
+#   crc(M) = (init * x^len(M) + M * x^w) mod P  +  xorout
+#
+# XORing two samples of the same length cancels init and xorout, so P
+# divides M1*x^w + M2*x^w + crc1 + crc2 and the GCD over all such pairs is P
+# itself, or a small multiple of it that is factored by trial division, so
+# at least two same length differences are needed. With P known, samples of
+# different lengths give a linear system for init, and xorout follows. Every
+# candidate is checked against all samples. Too few samples to pin the
+# answer down raise a ValueError instead of listing only some solutions.
+import argparse
+import sys
+
+from crc_reference import *
+
+# largest cofactor degree tried when the GCD is a multiple of P
+MAX_COFACTOR_DEGREE = 16
+# most init solutions tried when the linear system is underdetermined
+MAX_NULLITY = 8
+
+#################################
+# GF(2) polynomials as ints
+#################################
+
+def poly_mod(a, b):
+    db = b.bit_length()
+    while a.bit_length() >= db:
+        a ^= b << (a.bit_length() - db)
+    return a
+
+def poly_divmod(a, b):
+    q = 0
+    db = b.bit_length()
+    while a.bit_length() >= db:
+        shift = a.bit_length() - db
+        q |= 1 << shift
+        a ^= b << shift
+    return q, a
+
+def poly_gcd(a, b):
+    while b:
+        a, b = b, poly_mod(a, b)
+    return a
+
+def poly_mulmod(a, b, p):
+    res = 0
+    while b:
+        if b & 1:
+            res ^= a
+        b >>= 1
+        a = poly_mod(a << 1, p)
+    return res
+
+def poly_xpow_mod(n, p):
+    """x^n mod p by square and multiply."""
+    res, base = 1, poly_mod(2, p)
+    while n:
+        if n & 1:
+            res = poly_mulmod(res, base, p)
+        base = poly_mulmod(base, base, p)
+        n >>= 1
+    return res
+
+#################################
+# Samples
+#################################
+
+def message_poly(message, reflect_in):
+    # first bit fed is the highest power of x
+    if reflect_in:
+        message = bytes(REFLECT8[b] for b in message)
+    return int.from_bytes(message, "big")
+
+def crc_poly(crc, bitwidth, reflect_out):
+    return reflect(crc, bitwidth) if reflect_out else crc
+
+def same_length_groups(samples):
+    by_length = {}
+    for message, crc in samples:
+        by_length.setdefault(len(message), []).append((message, crc))
+    return list(by_length.values())
+
+def difference_count(samples):
+    return sum(len(group) - 1 for group in same_length_groups(samples))
+
+def poly_candidates(samples, bitwidth, reflect_in, reflect_out):
+    """Degree bitwidth divisors of the GCD of all same length differences."""
+    g = 0
+    for group in same_length_groups(samples):
+        m0, c0 = group[0]
+        for message, crc in group[1:]:
+            d = (message_poly(m0, reflect_in) ^ message_poly(message, reflect_in)) << bitwidth
+            d ^= crc_poly(c0 ^ crc, bitwidth, reflect_out)
+            g = poly_gcd(g, d) if g else d
+
+    if g.bit_length() - 1 < bitwidth:
+        return []
+    if g.bit_length() - 1 == bitwidth:
+        return [g]
+
+    # a small cofactor is left over, P is g divided by it
+    excess = g.bit_length() - 1 - bitwidth
+    if excess > MAX_COFACTOR_DEGREE:
+        raise ValueError("underdetermined, the GCD has %d bits more than the polynomial" % excess)
+
+    candidates = []
+    for q in range(1 << excess, 1 << (excess + 1)):
+        p, r = poly_divmod(g, q)
+        if not r and p & 1:
+            candidates.append(p)
+
+    return candidates
+
+def gf2_solve(rows, nunknowns):
+    """Solve rows of (coefficient bits, rhs bit) over GF(2).
+
+    Returns every solution, an empty list if there are none. Raises a
+    ValueError when the nullity is above MAX_NULLITY.
+    """
+    pivots = []
+    for coeffs, rhs in rows:
+        row = coeffs | (rhs << nunknowns)
+        for pivot, prow in pivots:
+            if row >> pivot & 1:
+                row ^= prow
+        if row & ((1 << nunknowns) - 1):
+            pivot = (row & ((1 << nunknowns) - 1)).bit_length() - 1
+            pivots = [(p, r ^ row if r >> pivot & 1 else r) for p, r in pivots]
+            pivots.append((pivot, row))
+        elif row:
+            # 0 = 1
+            return []
+
+    free = [i for i in range(nunknowns) if i not in set(p for p, _ in pivots)]
+    if len(free) > MAX_NULLITY:
+        raise ValueError("underdetermined, %d free bits" % len(free))
+
+    solutions = []
+    for k in range(1 << len(free)):
+        x = sum(1 << f for i, f in enumerate(free) if k >> i & 1)
+        for pivot, row in pivots:
+            coeffs = row & ((1 << nunknowns) - 1) & ~(1 << pivot)
+            bit = (row >> nunknowns) ^ bin(coeffs & x).count("1")
+            x |= (bit & 1) << pivot
+        solutions.append(x)
+
+    return solutions
+
+def solve_init_xorout(samples, bitwidth, p, reflect_in, reflect_out):
+    """(init, xorout) pairs for a known polynomial, in catalogue form."""
+    # K = crc + M*x^w mod P = init*x^len mod P + xorout, all unreflected
+    terms = []
+    for message, crc in samples:
+        k = crc_poly(crc, bitwidth, reflect_out) ^ poly_mod(message_poly(message, reflect_in) << bitwidth, p)
+        terms.append((len(message) * 8, k))
+
+    len0, k0 = terms[0]
+    x0 = poly_xpow_mod(len0, p)
+    rows = []
+    for length, k in terms[1:]:
+        if length == len0:
+            continue
+        # init * (x^len0 + x^len) mod P = K0 + K
+        s = x0 ^ poly_xpow_mod(length, p)
+        columns = [poly_mulmod(1 << j, s, p) for j in range(bitwidth)]
+        rows += [(sum((columns[j] >> i & 1) << j for j in range(bitwidth)), (k0 ^ k) >> i & 1)
+                for i in range(bitwidth)]
+
+    if rows:
+        inits = gf2_solve(rows, bitwidth)
+    else:
+        # only one length seen, init and xorout cannot be told apart
+        inits = [0, (1 << bitwidth) - 1]
+
+    pairs = []
+    for init in inits:
+        xorout = k0 ^ poly_mulmod(init, x0, p)
+        pairs.append((init, crc_poly(xorout, bitwidth, reflect_out)))
+
+    return pairs
+
+def crc_of(config, message):
+    return crc_finalize(config, crc_update(config, crc_init_state(config), message))
+
+def simplicity(config):
+    # init and xorout closest to all zeros or all ones first
+    mask = (1 << config.bitwidth) - 1
+    bits = lambda v: min(bin(v).count("1"), bin(v ^ mask).count("1"))
+    return bits(config.init) + bits(config.xorout)
+
+def solve(samples, bitwidth):
+    """Every CrcConfig consistent with all (message, crc) samples.
+
+    When P has a factor of x + 1, init = P / (x + 1) is unchanged by any
+    number of message bits and folds into xorout, so some solutions give the
+    same CRC for every message. Catalogue CRCs are listed first, then the
+    simplest init and xorout. Raises a ValueError when the samples leave
+    the solution underdetermined.
+    """
+    mask = (1 << bitwidth) - 1
+    configs = []
+    errors = []
+
+    for reflect_in in (False, True):
+        for reflect_out in (False, True):
+            try:
+                for p in poly_candidates(samples, bitwidth, reflect_in, reflect_out):
+                    for init, xorout in solve_init_xorout(samples, bitwidth, p, reflect_in, reflect_out):
+                        config = CC(bitwidth, 0, p & mask, init, reflect_in, reflect_out, xorout)
+                        if all(crc_of(config, m) == c for m, c in samples):
+                            configs.append(config._replace(check=crc_of(config, CRC_CHECK_STRING.encode())))
+            except ValueError as e:
+                errors.append(e)
+
+    # an underdetermined reflect combination may hide solutions
+    if errors:
+        raise errors[0]
+
+    return sorted(configs, key=lambda c: (catalogue_name(c) is None, simplicity(c)))
+
+def catalogue_name(config):
+    return CRC_INDEX.by_config(config)
+
+def catalogue_line(config, name):
+    # the reveng format of crc_catalogue.txt
+    h = lambda v: "0x%0*x" % ((config.bitwidth + 3) // 4, v)
+    b = lambda v: "true" if v else "false"
+    return 'width=%d poly=%s init=%s refin=%s refout=%s xorout=%s check=%s residue=%s name="%s"' % (
+        config.bitwidth, h(config.poly), h(config.init), b(config.reflect_in), b(config.reflect_out),
+        h(config.xorout), h(config.check), h(crc_residue(config)), name)
+
+def parse_sample(text):
+    message, crc = text.split(":")
+    return bytes.fromhex(message), int(crc, 16)
+
+def main():
+    parser = argparse.ArgumentParser(description="Recover CRC parameters from message/CRC samples")
+    parser.add_argument("-w", "--width", type=int, required=True, help="CRC width in bits")
+    parser.add_argument("samples", nargs="*", help="MESSAGE_HEX:CRC_HEX pairs")
+    parser.add_argument("-f", "--file", help="file with one MESSAGE_HEX:CRC_HEX per line")
+    parser.add_argument("--name", default="CRC-%(width)d/UNKNOWN", help="name for the catalogue line")
+    args = parser.parse_args()
+
+    samples = [parse_sample(s) for s in args.samples]
+    if args.file:
+        with open(args.file) as fp:
+            samples += [parse_sample(line.strip()) for line in fp if line.strip()]
+
+    if difference_count(samples) < 2:
+        print("not enough data, need at least three messages of one length or two pairs of equal length messages",
+                file=sys.stderr)
+        return 1
+
+    try:
+        configs = solve(samples, args.width)
+    except ValueError as e:
+        print("%s, add more samples" % e, file=sys.stderr)
+        return 1
+
+    if not configs:
+        print("no CRC matches every sample", file=sys.stderr)
+        return 1
+
+    if len(set(len(m) for m, _ in samples)) == 1:
+        print("all messages have the same length, init and xorout are only one possible split", file=sys.stderr)
+
+    if len(configs) > 1:
+        print("%d configs match every sample, most likely first" % len(configs), file=sys.stderr)
+
+    for config in configs:
+        print(catalogue_line(config, catalogue_name(config) or args.name % {"width": args.width}))
+        print("  %r" % (config,))
+        if config.bitwidth <= MAX_BITS:
+            print("  bitstream %s" % config_bitstream(config).packed.hex())
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
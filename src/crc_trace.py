@@ -0,0 +1,228 @@
+# Selectable waveform capture for the testbenches.
+#
+# CRC_TRACE picks the mode for the tests matching CRC_TRACE_TESTS (comma
+# separated fnmatch patterns, every test by default):
+#   off   nothing is captured, the default
+#   vcd   the simulator dumps $(TOPLEVEL).vcd or, with fst, the compact
+#   fst   binary FST. Dumping is switched on only while a selected test
+#         runs, through dump_enable in crc_decelerator_tb.v
+#   ring  the last CRC_TRACE_CYCLES cycles of the pins (and the datapath
+#         registers on RTL runs) are kept in Python and written to
+#         <test>.ring.vcd only when the test fails
+#
+# CRC_PIN_TRACE keeps a cycle by cycle trace of cmd, data_in and io_out for
+# the tests matching CRC_PIN_TRACE_TESTS (the catalogue sweep by default):
+#   record   RTL runs write a .pins file to CRC_PIN_TRACE_DIR when it passes
+#   compare  gate level runs check every cycle against the recorded trace
+#            and fail on the first difference, or if there is none
+# Traces are named after the test function and its TestFactory options (the
+# CRC name), not the indexed test name, which differs between RTL and gate
+# level runs of the sweep.
+#
+# Tests opt in with @traced under @cocotb.test(). The modes are only read at
+# run time, so switching them reuses the cached simulator build.
+import collections
+import fnmatch
+import functools
+import os
+import re
+
+from common_test import NGL_TEST
+from crc_profile import current_test
+
+TRACE_MODE = os.environ.get("CRC_TRACE", "off")
+TRACE_TESTS = os.environ.get("CRC_TRACE_TESTS", "*").split(",")
+TRACE_CYCLES = int(os.environ.get("CRC_TRACE_CYCLES", 1024))
+
+PIN_TRACE_MODE = os.environ.get("CRC_PIN_TRACE", "off")
+PIN_TRACE_TESTS = os.environ.get("CRC_PIN_TRACE_TESTS", "test_crc_e2e_*").split(",")
+PIN_TRACE_DIR = os.environ.get("CRC_PIN_TRACE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "pin_traces"))
+
+# sampled in ring mode, the datapath only exists in the RTL
+RING_SIGNALS = ["rst", "cmd", "data_in", "io_out"]
+RING_SIGNALS_NGL = ["crc.current_cmd", "crc.setup_fsm", "crc.crc_state", "crc.crc_bit_index", "crc.crc_result"]
+
+def trace_mode(test_name, mode=TRACE_MODE, patterns=TRACE_TESTS):
+    if any(fnmatch.fnmatchcase(test_name, pattern) for pattern in patterns):
+        return mode
+    return "off"
+
+def pin_trace_name(fn, kwargs):
+    options = [re.sub(r"[^0-9a-z]+", "_", str(kwargs[k]).lower()) for k in sorted(kwargs)]
+    return "__".join([fn.__name__] + options) + ".pins"
+
+def write_vcd(path, signals, samples, timescale="1ns"):
+    """Write (time, values) samples of (name, width) signals as a VCD."""
+    ids = [chr(33 + i) for i in range(len(signals))]
+
+    with open(path, "w") as fp:
+        fp.write("$timescale %s $end\n$scope module ring $end\n" % timescale)
+        for (name, width), id in zip(signals, ids):
+            fp.write("$var wire %d %s %s $end\n" % (width, id, name.replace(".", "_")))
+        fp.write("$upscope $end\n$enddefinitions $end\n")
+
+        last = [None] * len(signals)
+        for time, values in samples:
+            changed = [(id, v) for i, (id, v) in enumerate(zip(ids, values)) if v != last[i]]
+            if changed:
+                fp.write("#%d\n" % time)
+                fp.writelines("b%s %s\n" % (v, id) for id, v in changed)
+            last = values
+
+class RingTrace:
+    """Samples signals after every rising edge into a bounded ring."""
+
+    def __init__(self, dut, cycles=TRACE_CYCLES):
+        names = RING_SIGNALS + (RING_SIGNALS_NGL if NGL_TEST else [])
+        self.dut = dut
+        self.handles = [functools.reduce(getattr, name.split("."), dut) for name in names]
+        self.signals = [(name, len(h)) for name, h in zip(names, self.handles)]
+        self.samples = collections.deque(maxlen=cycles)
+        self._task = None
+
+    async def _sample(self):
+        from cocotb.triggers import FallingEdge
+        from cocotb.utils import get_sim_time
+
+        edge = FallingEdge(self.dut.clk)
+        while True:
+            await edge
+            self.samples.append((int(get_sim_time("ns")), tuple(h.value.binstr for h in self.handles)))
+
+    def start(self):
+        import cocotb
+        self._task = cocotb.start_soon(self._sample())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    def write(self, path):
+        write_vcd(path, self.signals, self.samples)
+        self.dut._log.info("last %d cycles written to %s", len(self.samples), path)
+
+class PinTrace:
+    """cmd, data_in and io_out sampled every cycle, either kept to be written
+    or checked against a trace recorded earlier."""
+
+    SIGNALS = ["cmd", "data_in", "io_out"]
+
+    def __init__(self, dut, expected=None):
+        self.dut = dut
+        self.handles = [getattr(dut, name) for name in self.SIGNALS]
+        self.expected = expected
+        self.samples = []
+        self.mismatch = None
+        self._task = None
+
+    @staticmethod
+    def load(path):
+        with open(path) as fp:
+            return [tuple(line.split()) for line in fp]
+
+    async def _sample(self):
+        from cocotb.triggers import FallingEdge
+
+        edge = FallingEdge(self.dut.clk)
+        while True:
+            await edge
+            self.add(tuple(h.value.binstr for h in self.handles))
+
+    def add(self, values):
+        cycle = len(self.samples)
+        self.samples.append(values)
+
+        if self.expected is None or self.mismatch is not None:
+            return
+
+        # cycles the RTL left undefined (before reset) are not compared
+        if cycle >= len(self.expected):
+            self.mismatch = (cycle, None, values)
+        elif any(e != v for e, v in zip(self.expected[cycle], values) if "x" not in e and "z" not in e):
+            self.mismatch = (cycle, self.expected[cycle], values)
+
+    def start(self):
+        import cocotb
+        self._task = cocotb.start_soon(self._sample())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.kill()
+            self._task = None
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as fp:
+            fp.writelines(" ".join(values) + "\n" for values in self.samples)
+
+    def check(self):
+        if self.mismatch is None and len(self.samples) < len(self.expected):
+            self.mismatch = (len(self.samples), self.expected[len(self.samples)], None)
+
+        if self.mismatch is not None:
+            cycle, expected, got = self.mismatch
+            raise AssertionError("pins differ from the RTL trace at cycle %d: %s %s, expected %s" % (
+                cycle, " ".join(self.SIGNALS), got, expected))
+
+async def capture_waves(fn, dut, test_name, *args, **kwargs):
+    mode = trace_mode(test_name)
+
+    if mode == "off":
+        return await fn(dut, *args, **kwargs)
+
+    if mode in ("vcd", "fst"):
+        dut.dump_enable.value = 1
+        try:
+            return await fn(dut, *args, **kwargs)
+        finally:
+            dut.dump_enable.value = 0
+
+    ring = RingTrace(dut)
+    ring.start()
+    try:
+        return await fn(dut, *args, **kwargs)
+    except Exception:
+        results = os.environ.get("COCOTB_RESULTS_FILE", "results.xml")
+        ring.write(os.path.join(os.path.dirname(os.path.abspath(results)), test_name + ".ring.vcd"))
+        raise
+    finally:
+        ring.stop()
+
+def traced(fn):
+    """Capture waveforms for a test according to CRC_TRACE, and record or
+    compare its pins according to CRC_PIN_TRACE."""
+    @functools.wraps(fn)
+    async def wrapper(dut, *args, **kwargs):
+        import cocotb
+
+        # nothing to trace when running on the Python model
+        if cocotb.top is None:
+            return await fn(dut, *args, **kwargs)
+
+        test_name = current_test()
+        pin_mode = trace_mode(test_name, PIN_TRACE_MODE, PIN_TRACE_TESTS)
+        path = os.path.join(PIN_TRACE_DIR, pin_trace_name(fn, kwargs))
+
+        if pin_mode == "compare" and not os.path.exists(path):
+            raise AssertionError("no RTL pin trace %s, record it with make rtl_traces" % path)
+
+        if pin_mode == "off":
+            return await capture_waves(fn, dut, test_name, *args, **kwargs)
+
+        pins = PinTrace(dut, PinTrace.load(path) if pin_mode == "compare" else None)
+        pins.start()
+        try:
+            result = await capture_waves(fn, dut, test_name, *args, **kwargs)
+        finally:
+            pins.stop()
+
+        if pin_mode == "record":
+            pins.write(path)
+        else:
+            pins.check()
+
+        return result
+
+    return wrapper
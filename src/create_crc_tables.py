@@ -1,17 +1,106 @@
-import requests
+#!/usr/bin/env python3
+# Compile the vendored reveng catalogue (crc_catalogue.txt) into
+# crc_catalogue.json, which crc_reference.py loads on first use.
+#
+# Every entry is checked against its check value with the table driven
+# engine and against its residue, both computed and, where the CRC is a
+# whole number of bytes, by running an appended codeword through the engine.
+# --tables also writes crc_tables.bin with the precomputed lookup tables.
+import argparse
+import json
+import os
 import re
+import sys
 
-URLS = ["https://reveng.sourceforge.io/crc-catalogue/1-15.htm", "https://reveng.sourceforge.io/crc-catalogue/16.htm", "https://reveng.sourceforge.io/crc-catalogue/17plus.htm"]
+from crc_reference import *
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
 
 r_crc = re.compile(r'width=([0-9]{1,2})\s+poly=(0x[a-fA-F0-9]+)\s+init=(0x[a-fA-F0-9]+)\s+refin=(true|false)\s+refout=(true|false)\s+xorout=(0x[a-fA-F0-9]+)\s+check=(0x[a-fA-F0-9]+)\s+residue=(0x[a-fA-F0-9]+)\s+name="([^"]+)')
 
-crcs = []
-for url in URLS:
-    res = requests.get(url)
-    for r in r_crc.findall(res.text):
+def parse_catalogue(text):
+    crcs = []
+    for r in r_crc.findall(text):
         width, poly, init, reflect_in, reflect_out, xorout, check, residue, name = r
-        reflect_in = reflect_in == "true"
-        reflect_out = reflect_out == "true"
-        name = f'"{name}":'
+        config = CC(int(width), int(check, 16), int(poly, 16), int(init, 16),
+                reflect_in == "true", reflect_out == "true", int(xorout, 16))
+        crcs.append((name, config, int(residue, 16)))
+
+    return crcs
+
+def codeword_residue(config):
+    # append the check value to the check string the way it is sent on the
+    # wire and read the register back, only possible for whole bytes
+    if config.bitwidth % 8 or config.reflect_in != config.reflect_out:
+        return None
+
+    nbytes = config.bitwidth // 8
+    codeword = CRC_CHECK_STRING.encode() + config.check.to_bytes(nbytes, "little" if config.reflect_out else "big")
+
+    return crc_update(config, crc_init_state(config), codeword)
+
+def validate(name, config, residue):
+    errors = []
+
+    crc = crc_finalize(config, crc_update(config, crc_init_state(config), CRC_CHECK_STRING.encode()))
+    if crc != config.check:
+        errors.append("check 0x%x, computed 0x%x" % (config.check, crc))
+
+    if residue != crc_residue(config):
+        errors.append("residue 0x%x, computed 0x%x" % (residue, crc_residue(config)))
+
+    codeword = codeword_residue(config)
+    if codeword is not None and codeword != residue:
+        errors.append("residue 0x%x, codeword gives 0x%x" % (residue, codeword))
+
+    return ["%s: %s" % (name, e) for e in errors]
+
+def write_catalogue(path, crcs):
+    entries = []
+    for name, config, residue in crcs:
+        h = lambda v: "0x%0*x" % ((config.bitwidth + 3) // 4, v)
+        entries.append(json.dumps([name, config.bitwidth, h(config.check), h(config.poly), h(config.init),
+            config.reflect_in, config.reflect_out, h(config.xorout), h(residue)]))
+
+    with open(path, "w") as fp:
+        fp.write("[\n" + ",\n".join(entries) + "\n]\n")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile and validate the CRC catalogue")
+    parser.add_argument("catalogue", nargs="?", default=os.path.join(SRC_DIR, "crc_catalogue.txt"),
+            help="reveng catalogue text or saved HTML pages")
+    parser.add_argument("-o", "--output", default=CATALOGUE_FILE)
+    parser.add_argument("--tables", nargs="?", const=TABLES_FILE,
+            help="also write precomputed lookup tables (default %(const)s)")
+    args = parser.parse_args()
+
+    with open(args.catalogue) as fp:
+        crcs = parse_catalogue(fp.read())
+
+    errors = []
+    seen = set()
+    for name, config, residue in crcs:
+        if name in seen:
+            errors.append("%s: duplicate entry" % name)
+        seen.add(name)
+        errors += validate(name, config, residue)
+
+    for error in errors:
+        print(error, file=sys.stderr)
+
+    if errors:
+        return 1
+
+    write_catalogue(args.output, crcs)
+    print("%d CRCs (%d up to %d bits) written to %s" % (len(crcs),
+        sum(config.bitwidth <= MAX_BITS for _, config, _ in crcs), MAX_BITS, args.output))
+
+    if args.tables:
+        configs = [config for _, config, _ in crcs] + list(CRC_TABLE_FAKE.values())
+        write_precomputed_tables(args.tables, configs)
+        print("lookup tables written to %s" % args.tables)
+
+    return 0
 
-        print(f'{name: <30}CC({width},\t{check},\t{poly},\t{init},\t{reflect_in},\t{reflect_out},\t{xorout}),')
+if __name__ == "__main__":
+    sys.exit(main())
@@ -16,10 +16,14 @@ module lfsrN_tb #(
     output [WIDTH-1:0] value
    );
 
+    // waveforms are only dumped with +waves=<file> (make CRC_TRACE=vcd or fst)
+    reg [8*64-1:0] waves_file;
+
     initial begin
-        $dumpfile ("lfsrN_tb.vcd");
-        $dumpvars (0, lfsrN_tb);
-        #1;
+        if ($value$plusargs("waves=%s", waves_file)) begin
+            $dumpfile (waves_file);
+            $dumpvars (0, lfsrN_tb);
+        end
     end
 
     // instantiate the DUT
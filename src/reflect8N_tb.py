@@ -1,7 +1,7 @@
 import cocotb
 from cocotb.triggers import Timer
 
-from common_test import reflect
+from common_test import reflect, reflect_array
 
 max_bytewidth = 4
 
@@ -54,3 +54,69 @@ async def test_reflect8N(dut):
             req_value = reflect(test_value, 8*bytewidth)
             #dut._log.info("%s REFLECT8N -> %s", bin(test_value), bin(req_value))
             assert value == req_value
+
+# must match MAX_BITS in reflect8N_tb.v, the lane count is read from the DUT
+LANE_BYTES = 4
+
+def reflect8N_vectors(bytewidth, random_count=1 << 14, seed=0x8f1e):
+    """Values to check at a bytewidth: every value up to 2 bytes, otherwise
+    walking ones and zeros, boundary patterns and a random bulk."""
+    import numpy as np
+
+    bits = 8*bytewidth
+    mask = (1 << bits) - 1
+
+    if bytewidth <= 2:
+        return np.arange(1 << bits, dtype=np.uint64)
+
+    walking = [1 << i for i in range(bits)]
+    walking += [mask ^ v for v in walking]
+
+    boundary = [0, 1, 2, mask, mask - 1, mask >> 1, (mask >> 1) + 1]
+    for pattern in [0x55, 0xaa, 0x0f, 0xf0, 0x33, 0xcc, 0x01, 0x80, 0x7f, 0xfe]:
+        boundary.append(int.from_bytes(bytes([pattern] * bytewidth), "little"))
+    for i in range(bytewidth):
+        # a single byte set or cleared
+        boundary += [0xff << (8*i), mask ^ (0xff << (8*i))]
+
+    rng = np.random.default_rng(seed + bytewidth)
+    bulk = rng.integers(0, 1 << bits, size=random_count, dtype=np.uint64)
+
+    return np.concatenate([np.array(walking + boundary, dtype=np.uint64), bulk])
+
+def lane_count(dut):
+    # only the reflect8N_tb in reflect8N_tb.v has the lane ports
+    assert hasattr(dut, "values"), "reflect8N_tb was not built from reflect8N_tb.v"
+    return len(dut.values) // (8*LANE_BYTES)
+
+async def check_reflect8N_lanes(dut, values, bytewidth):
+    import numpy as np
+
+    count = lane_count(dut)
+    lanes = np.zeros(count, dtype="<u4")
+    lanes[:len(values)] = values
+    dut.values.value = int.from_bytes(lanes.tobytes(), "little")
+    # combinational delay
+    await Timer(10, units="ns")
+
+    got = np.frombuffer(int(dut.reflected_values.value).to_bytes(count*LANE_BYTES, "little"), dtype="<u4")
+    expected = reflect_array(lanes, 8*bytewidth)
+    bad = np.nonzero(got != expected)[0]
+
+    for i in bad[:8]:
+        dut._log.error("reflect8N_%d lane %d: %x -> %x, expected %x", bytewidth, i, lanes[i], got[i], expected[i])
+
+    assert len(bad) == 0
+
+@cocotb.test()
+async def test_reflect8N_batched(dut):
+    # exhaustive for 1-2 bytes, stratified for 3-4, one value per lane per callback
+    lanes = lane_count(dut)
+
+    for bytewidth in range(1, max_bytewidth+1):
+        values = reflect8N_vectors(bytewidth)
+        dut._log.info("reflect8N_%d %d values", bytewidth, len(values))
+        dut.bytewidth.value = bytewidth - 1
+
+        for i in range(0, len(values), lanes):
+            await check_reflect8N_lanes(dut, values[i:i+lanes], bytewidth)
@@ -4,28 +4,56 @@
 module reflect8N_tb #(
   parameter MAX_BITS = 32,
   parameter MAX_BYTES = 4,
-  parameter MAX_BYTE_WIDTH = 2
+  parameter MAX_BYTE_WIDTH = 2,
+  // independent copies checked per simulator callback by test_reflect8N_batched
+  parameter LANES = 1024
 )(
-    input [MAX_BITS-1:0] value,
-    input [MAX_BYTE_WIDTH-1:0] bytewidth,
-    output [MAX_BITS-1:0] reflected_value
+    // as wide as the ports test_reflect8N drives, the DUT sees the low bits
+    input [63:0] value,
+    input [2:0] bytewidth,
+    output [63:0] reflected_value,
+    // lane i is values[i*MAX_BITS +: MAX_BITS]
+    input [LANES*MAX_BITS-1:0] values,
+    output [LANES*MAX_BITS-1:0] reflected_values
    );
 
+    // waveforms are only dumped with +waves=<file> (make CRC_TRACE=vcd or fst)
+    reg [8*64-1:0] waves_file;
+
     initial begin
-        $dumpfile ("reflect8N_tb.vcd");
-        $dumpvars (0, reflect8N_tb);
-        #1;
+        if ($value$plusargs("waves=%s", waves_file)) begin
+            $dumpfile (waves_file);
+            $dumpvars (0, reflect8N_tb);
+        end
     end
 
+    wire [MAX_BITS-1:0] dut_reflected_value;
+    assign reflected_value = {{64-MAX_BITS{1'b0}}, dut_reflected_value};
+
     // instantiate the DUT
     reflect8N #(MAX_BITS, MAX_BYTES, MAX_BYTE_WIDTH) rf8N(
         `ifdef GL_TEST
             .vccd1( 1'b1),
             .vssd1( 1'b0),
         `endif
-        .value  (value),
-        .bytewidth  (bytewidth),
-        .reflected_value (reflected_value)
+        .value  (value[MAX_BITS-1:0]),
+        .bytewidth  (bytewidth[MAX_BYTE_WIDTH-1:0]),
+        .reflected_value (dut_reflected_value)
         );
 
+    genvar lane;
+    generate for (lane = 0; lane < LANES; lane = lane + 1)
+      begin: lanes
+        reflect8N #(MAX_BITS, MAX_BYTES, MAX_BYTE_WIDTH) rf8N(
+            `ifdef GL_TEST
+                .vccd1( 1'b1),
+                .vssd1( 1'b0),
+            `endif
+            .value  (values[lane*MAX_BITS +: MAX_BITS]),
+            .bytewidth  (bytewidth[MAX_BYTE_WIDTH-1:0]),
+            .reflected_value (reflected_values[lane*MAX_BITS +: MAX_BITS])
+            );
+      end
+    endgenerate
+
 endmodule
@@ -7,11 +7,14 @@ module reflect8_tb (
     output [7:0] outp
    );
 
-    // this part dumps the trace to a vcd file that can be viewed with GTKWave
+    // waveforms are only dumped with +waves=<file> (make CRC_TRACE=vcd or fst)
+    reg [8*64-1:0] waves_file;
+
     initial begin
-        $dumpfile ("reflect8_tb.vcd");
-        $dumpvars (0, reflect8_tb);
-        #1;
+        if ($value$plusargs("waves=%s", waves_file)) begin
+            $dumpfile (waves_file);
+            $dumpvars (0, reflect8_tb);
+        end
     end
 
     // wire up the inputs and outputs
@@ -27,28 +30,3 @@ module reflect8_tb (
         );
 
 endmodule
-
-module reflect8N_tb (
-    input [63:0] value,
-    input [2:0] bytewidth,
-    output [63:0] reflected_value
-   );
-
-    initial begin
-        $dumpfile ("reflect8N_tb.vcd");
-        $dumpvars (0, reflect8N_tb);
-        #1;
-    end
-
-    // instantiate the DUT
-    reflect8N rf8N(
-        `ifdef GL_TEST
-            .vccd1( 1'b1),
-            .vssd1( 1'b0),
-        `endif
-        .value  (value),
-        .bytewidth  (bytewidth),
-        .reflected_value (reflected_value)
-        );
-
-endmodule
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# Run the cocotb testbenches sharded across parallel simulator processes.
+#
+# Each bench is compiled once, its tests are split into shards selected with
+# TESTCASE and every shard runs in its own vvp process and directory. The
+# per-shard results.xml files are merged into a single results.xml.
+import argparse
+import os
+import subprocess
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (TOPLEVEL, MODULE) in the same order as the my_sim target
+BENCHES = [
+    ("crc_decelerator_tb", "crc_decelerator_tb"),
+    ("crc_decelerator_multi_tb", "crc_decelerator_multi_tb"),
+    ("lfsrN_tb", "lfsrN_tb"),
+    ("reflect8_tb", "reflect8_tb"),
+    ("reflect8N_tb", "reflect8N_tb"),
+]
+
+# Only the top level testbench exists in the gate level netlist build
+GL_BENCHES = BENCHES[:1]
+
+# Rough cost of long running tests relative to a single test_crc_e2e case
+TEST_WEIGHTS = {
+    "test_multi_random": 20,
+    "test_crc_resume": 3,
+    "test_crc_stream": 10,
+    "test_crc_residue": 10,
+    "test_fuzz_corpus": 5,
+}
+
+def discover_tests(module):
+    import cocotb
+    import importlib
+
+    mod = importlib.import_module(module)
+    return [name for name, obj in vars(mod).items() if isinstance(obj, cocotb.test)]
+
+def make_shards(tests, count):
+    # greedy longest-first packing so heavy tests do not share a shard
+    shards = [[] for i in range(min(count, len(tests)))]
+    loads = [0] * len(shards)
+
+    for test in sorted(tests, key=lambda t: -TEST_WEIGHTS.get(t, 1)):
+        i = loads.index(min(loads))
+        shards[i].append(test)
+        loads[i] += TEST_WEIGHTS.get(test, 1)
+
+    return [shard for shard in shards if shard]
+
+def make_args(toplevel, module, build_dir):
+    return ["make", "-f", os.path.join(SRC_DIR, "Makefile"),
+            "TOPLEVEL=%s" % toplevel, "MODULE=%s" % module, "SIM_BUILD=%s" % build_dir]
+
+def make_env():
+    env = dict(os.environ)
+    # the Makefile locates sources relative to $(PWD)
+    env["PWD"] = SRC_DIR
+    env["PYTHONPATH"] = os.pathsep.join([SRC_DIR] + ([env["PYTHONPATH"]] if "PYTHONPATH" in env else []))
+
+    return env
+
+def compile_bench(toplevel, module, out_dir):
+    build_dir = os.path.join(out_dir, "sim_build", toplevel)
+    os.makedirs(build_dir, exist_ok=True)
+
+    subprocess.run(make_args(toplevel, module, build_dir) + [os.path.join(build_dir, "sim.vvp")],
+            cwd=out_dir, env=make_env(), check=True, stdout=subprocess.DEVNULL)
+
+    return build_dir
+
+def run_shard(shard_id, toplevel, module, build_dir, tests, out_dir):
+    shard_dir = os.path.join(out_dir, "shard_%03d" % shard_id)
+    os.makedirs(shard_dir, exist_ok=True)
+    results = os.path.join(shard_dir, "results.xml")
+
+    args = make_args(toplevel, module, build_dir) + ["sim",
+            "TESTCASE=%s" % ",".join(tests), "COCOTB_RESULTS_FILE=%s" % results]
+
+    start = time.monotonic()
+    with open(os.path.join(shard_dir, "sim.log"), "w") as log:
+        proc = subprocess.run(args, cwd=shard_dir, env=make_env(), stdout=log, stderr=subprocess.STDOUT)
+    wall_time = time.monotonic() - start
+
+    return shard_id, module, tests, results, wall_time, proc.returncode
+
+def merge_results(shard_results, output):
+    merged = ET.Element("testsuites", name="results")
+    failures = 0
+
+    for shard_id, module, tests, results, wall_time, returncode in shard_results:
+        if not os.path.exists(results):
+            # simulator died before cocotb could write any results
+            suite = ET.SubElement(merged, "testsuite", name="shard_%03d" % shard_id, package=module)
+            for test in tests:
+                case = ET.SubElement(suite, "testcase", name=test, classname=module)
+                ET.SubElement(case, "failure", message="shard exited with code %d" % returncode)
+            failures += len(tests)
+            continue
+
+        for suite in ET.parse(results).getroot().iter("testsuite"):
+            suite.set("name", "shard_%03d" % shard_id)
+            props = suite.find("properties")
+            if props is None:
+                props = ET.SubElement(suite, "properties")
+            ET.SubElement(props, "property", name="wall_time_s", value="%.3f" % wall_time)
+
+            failures += len(suite.findall("testcase/failure")) + len(suite.findall("testcase/error"))
+            merged.append(suite)
+
+    ET.ElementTree(merged).write(output, encoding="UTF-8", xml_declaration=True)
+
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the cocotb regression across parallel simulator shards")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(),
+            help="number of simulator processes to run at once")
+    parser.add_argument("-o", "--output", default=os.path.join(SRC_DIR, "results.xml"),
+            help="merged results file")
+    parser.add_argument("--out-dir", default=os.path.join(SRC_DIR, "sim_shards"),
+            help="directory for per-shard builds, logs and results")
+    parser.add_argument("--bench", action="append",
+            help="only run the given testbench MODULE (may be repeated)")
+    args = parser.parse_args()
+
+    sys.path.insert(0, SRC_DIR)
+    gates = os.environ.get("GATES") == "yes"
+    benches = [b for b in (GL_BENCHES if gates else BENCHES) if not args.bench or b[1] in args.bench]
+    out_dir = os.path.abspath(args.out_dir)
+
+    jobs = []
+    for toplevel, module in benches:
+        build_dir = compile_bench(toplevel, module, out_dir)
+
+        for tests in make_shards(discover_tests(module), args.jobs):
+            jobs.append((len(jobs), toplevel, module, build_dir, tests, out_dir))
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+        shard_results = list(pool.map(lambda job: run_shard(*job), jobs))
+    wall_time = time.monotonic() - start
+
+    for shard_id, module, tests, results, shard_time, returncode in shard_results:
+        print("shard %03d %-20s %3d tests %8.2fs%s" % (shard_id, module, len(tests), shard_time,
+            "" if returncode == 0 else "  (exit %d)" % returncode))
+
+    failures = merge_results(shard_results, args.output)
+    print("%d shards in %.2fs on %d jobs, %d failures" % (len(jobs), wall_time, args.jobs, failures))
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
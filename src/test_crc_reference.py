@@ -0,0 +1,99 @@
+import os
+import random
+import subprocess
+import sys
+
+from crc_reference import *
+from crc_host import CrcHost, LoopbackTransport
+
+ALL_NAMES = list(CRC_TABLE.keys()) + list(CRC_TABLE_FAKE.keys()) + list(CRC_TABLE_WIDE.keys())
+
+# modules every simulator process loads, neither may pull in cocotb or NumPy
+LIGHT_IMPORTS = ["crc_reference", "common_test"]
+HEAVY_MODULES = ["cocotb", "numpy"]
+
+def random_bytes(length):
+    return bytes(random.choice(range(0, 0x100)) for i in range(length))
+
+def test_light_imports():
+    for module in LIGHT_IMPORTS:
+        proc = subprocess.run([sys.executable, "-c",
+            "import sys, %s; print(' '.join(m for m in %r if m in sys.modules))" % (module, HEAVY_MODULES)],
+            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True, check=True)
+        heavy = proc.stdout.split()
+
+        assert not heavy, "importing %s pulls in %s" % (module, ", ".join(heavy))
+
+def test_golden_crc_table():
+    # the table driven golden model must match the bit serial one exactly
+    random.seed(2349871)
+
+    for crc_name in ALL_NAMES:
+        config = get_config(crc_name)
+
+        if crc_name not in CRC_TABLE_FAKE:
+            assert golden_crc(crc_name, CRC_CHECK_STRING.encode()) == config.check
+
+        for length in [0, 1, 3, 8, 17, 64]:
+            test_string = random_bytes(length)
+            expected = golden_crc_bitwise(crc_name, test_string)
+
+            for slices in [1, 4, 8]:
+                crc = crc_update(config, crc_init_state(config), test_string, slices)
+                assert crc_finalize(config, crc) == expected
+
+def test_golden_crc_all():
+    random.seed(2349872)
+
+    for length in [0, 1, 9, 100]:
+        test_string = random_bytes(length)
+        for crc_name, crc in golden_crc_all(test_string, ALL_NAMES).items():
+            assert crc == golden_crc(crc_name, test_string)
+
+def test_catalogue_index():
+    for crc_name in list(CRC_TABLE.keys()) + list(CRC_TABLE_WIDE.keys()):
+        config = get_config(crc_name)
+
+        assert crc_name in CRC_INDEX.by_check(config.check, config.bitwidth)
+        assert crc_name in CRC_INDEX.by_residue(crc_residue(config), config.bitwidth)
+        assert crc_name in CRC_INDEX.by_poly(config.bitwidth, config.poly)
+        assert CRC_INDEX.by_config(config) == crc_name
+
+def test_crc_residue_readback():
+    # whole-byte CRCs read back the catalogue residue with xorout applied
+    for crc_name, config in CRC_TABLE.items():
+        if config.bitwidth % 8 == 0 and config.reflect_in == config.reflect_out:
+            assert crc_residue_readback(config) == CRC_TABLE.residue(crc_name) ^ config.xorout
+
+def test_crc_combine():
+    random.seed(9832174)
+
+    for crc_name in ["CRC-32/ISO-HDLC", "CRC-16/USB", "CRC-8/SMBUS", "CRC-5/USB", "CRC-3/GSM", "CRC-64/XZ"]:
+        config = get_config(crc_name)
+        chunks = [random_bytes(random.randint(0, 8)) for n in range(6)]
+
+        crc = golden_crc(crc_name, chunks[0])
+        for chunk in chunks[1:]:
+            crc = crc_combine(config, crc, golden_crc(crc_name, chunk), len(chunk))
+        assert crc == golden_crc(crc_name, b"".join(chunks))
+
+        for n in [0, 1, 7, 300, 4097]:
+            assert crc_extend_zeros(config, crc, n) == golden_crc(crc_name, b"".join(chunks) + bytes(n))
+
+def test_setup_config():
+    for table in (CRC_TABLE, CRC_TABLE_FAKE):
+        for crc_name, config in table.items():
+            if config.bitwidth <= MAX_BITS:
+                assert setup_config(config_nibbles(config)) == config._replace(check=0)
+
+def test_host_loopback():
+    random.seed(70214)
+
+    host = CrcHost(LoopbackTransport())
+    crc_names = random.sample(list(CRC_TABLE.keys()), 6)
+    for i in range(24):
+        # runs of the same config skip SETUP
+        host.queue(crc_names[i // 4], random_bytes(random.randint(0, 12)))
+
+    for job in host.flush():
+        assert job.result == golden_crc(job.crc_name, job.message)